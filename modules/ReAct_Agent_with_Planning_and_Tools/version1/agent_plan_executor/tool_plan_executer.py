@@ -6,6 +6,19 @@ from datetime import datetime
 from pathlib import Path
 import re
 
+# Token accounting is shared with the rest of the project (needs the repo root on sys.path)
+try:
+    from modules.token_counter.usage import usage_tracker
+except ImportError:
+    usage_tracker = None
+
+# Opt-in response cache for temperature-0 calls (LLM_CACHE=1)
+try:
+    from modules.llm_client.cache import cached_chat_completion
+except ImportError:
+    def cached_chat_completion(**request):
+        return openai.chat.completions.create(**request)
+
 # 👇 Set your OpenAI key and model
 openai.api_key = "your-api-key-here"
 MODEL = "gpt-4o"
@@ -46,11 +59,14 @@ Fix the following broken JSON and return it as valid, minimal, properly formatte
 {text}
 <end>
 """
-    response = openai.chat.completions.create(
+    messages = [{"role": "user", "content": prompt}]
+    response = cached_chat_completion(
         model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
+        messages=messages,
         temperature=0
     )
+    if usage_tracker:
+        usage_tracker.record("json_repair", MODEL, response, messages=messages)
     return response.choices[0].message.content.strip()
 
 def run_tool(tool_name, params):
@@ -73,20 +89,24 @@ def run_tool(tool_name, params):
 def execute_plan(plan: dict, context=None):
     """
     Executes a sequence of planned actions with optional conditional logic.
+    Returns False if a tool that ran gave no result (e.g. an unknown tool).
     """
+    results = []
     for action in plan["planned_actions"]:
         condition = action["when"]
         if condition == "always":
-            run_tool(action["tool"], action["params"])
+            results.append(run_tool(action["tool"], action["params"]))
         elif condition == "on_timeout" and context == "timeout detected":
-            run_tool(action["tool"], action["params"])
+            results.append(run_tool(action["tool"], action["params"]))
         elif condition == "after_timeout_in_fix" and context == "timeout increased":
-            run_tool(action["tool"], action["params"])
+            results.append(run_tool(action["tool"], action["params"]))
         # You can extend with more conditions here
+    return all(result is not None for result in results)
 
-def extract_and_save_trace(raw_text: str):
+def extract_and_save_trace(raw_text: str, usage: dict = None):
     """
-    Extracts the <trace> block from LLM output and saves it to a local trace file.
+    Extracts the <trace> block from LLM output and saves it to a local trace file,
+    followed by the token usage of the scenario when given.
     Also returns the filename that was saved.
     """
     try:
@@ -98,6 +118,8 @@ def extract_and_save_trace(raw_text: str):
 
     timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
     trace_file = TRACE_DIR / f"trace_{timestamp}.txt"
+    if usage:
+        trace_block += "\n=== Token Usage ===\n" + "\n".join(f"{key}: {value}" for key, value in usage.items()) + "\n"
     trace_file.write_text(trace_block)
 
     # Optional: store in Postgres (if needed)
@@ -153,12 +175,13 @@ def extract_json_from_wrapped_output(raw_text: str):
         raise ValueError(f"❌ Failed to parse JSON: {e}")
 
 
-def handle_llm_plan_output(llm_output: str):
+def handle_llm_plan_output(llm_output: str, usage: dict = None):
     """
     Main entry point: validates or repairs the LLM plan,
     saves trace, and runs the planned tools accordingly.
+    Returns the plan only when it was valid and every tool it ran succeeded.
     """
-    extract_and_save_trace(llm_output)
+    extract_and_save_trace(llm_output, usage=usage)
 
     try:
         plan = extract_json_from_wrapped_output(llm_output)
@@ -176,8 +199,17 @@ def handle_llm_plan_output(llm_output: str):
             print("❌ Invalid action structure: missing required fields")
             return
 
+    return handle_known_plan(plan)
+
+def handle_known_plan(plan: dict):
+    """
+    Runs an already validated plan (e.g. a known fix reused from the
+    embeddings store) without calling the LLM. Returns None if a tool failed.
+    """
     first_result = run_tool("read_log", {})
-    execute_plan(plan, context=first_result)
+    if not execute_plan(plan, context=first_result):
+        print("⚠️ A planned tool failed")
+        return None
     return plan
 
 # For external use from another file:
@@ -1,11 +1,28 @@
 # run_agent_pipeline.py
-from structured_plan_generator/generate_structured_planned_actions_from_errors.py import generate_planned_actions_from_errors
-from agent_plan_executor/tool_plan_executer.py import handle_llm_plan_output
+import sys
+import time
+from pathlib import Path
+
+# Make the repository root importable for the shared modules (modules.*)
+sys.path.append(str(Path(__file__).resolve().parents[3]))
+
+from structured_plan_generator.generate_structured_planned_actions_from_errors import generate_planned_actions_from_errors
+from agent_plan_executor.tool_plan_executer import handle_llm_plan_output, handle_known_plan, TRACE_DIR
 import openai
 from dotenv import load_dotenv
 import os
 import re
 
+from modules.llm_client.cache import cached_chat_completion, response_cache
+from modules.llm_client.logic import stream_chat_until
+from modules.token_counter.usage import scenario, usage_tracker
+
+try:
+    from modules.log_embeddings_similarity.known_fixes import KNOWN_FIXES, KnownFixStore
+except ImportError as e:
+    print(f"⚠️ Known-fix retrieval disabled ({e})")
+    KNOWN_FIXES, KnownFixStore = False, None
+
 # Load environment variables
 load_dotenv("C:/Users/tziyo/OneDrive/Documents/learning python/variables and datatypes/.vscode/.env")
 
@@ -14,6 +31,13 @@ load_dotenv("C:/Users/tziyo/OneDrive/Documents/learning python/variables and dat
 openai.api_key = os.getenv("OPEN_AI_API_KEY")
 MODEL = "gpt-4o"
 
+# ⚡ STREAM_RESPONSES=1 streams plans and cancels them at <end>. Off by default: a cancelled
+# stream never gets its usage chunk, so cached tokens and cost are only estimated
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "0") == "1"
+
+# Token budget per error log context in the prompts (0 = send the context as is)
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", "0")) or None
+
 # Example input: list of parsed errors
 example_error_list = [
     {
@@ -465,19 +489,63 @@ example_error_list = [
     }
 ]
 
-# Send prompt to OpenAI and return the response text
-def call_llm(prompt: str) -> str:
-    response = openai.chat.completions.create(
+# Send chat messages (static system prompt + log) to OpenAI and return the response text
+def call_llm(messages: list) -> str:
+    if STREAM_RESPONSES:
+        result = stream_chat_until(messages, MODEL, stage="plan", temperature=0)
+        print(f"⏱️ First token {result['ttft_s']:.2f}s | total {result['total_s']:.2f}s"
+              f"{' | stopped at <end>' if result['stopped_early'] else ''}")
+        return result["text"].strip()
+
+    response = cached_chat_completion(
         model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
+        messages=messages,
         temperature=0
     )
+    usage_tracker.record("plan", MODEL, response, messages=messages)
     return response.choices[0].message.content.strip()
 
-# Generate prompts
-prompts = generate_planned_actions_from_errors(example_error_list)
+def run_agent_pipeline():
+    """
+    Plans and executes a fix for every example error.
+    Failures similar enough to an already solved one reuse its stored plan
+    and skip the LLM; everything else goes through call_llm.
+    """
+    known_fixes = KnownFixStore("v1-plans") if KnownFixStore and KNOWN_FIXES else None
+
+    # Generate prompts (one message list per error)
+    prompts = generate_planned_actions_from_errors(example_error_list, max_context_tokens=MAX_CONTEXT_TOKENS)
+
+    # Run each one
+    for i, (error, prompt) in enumerate(zip(example_error_list, prompts)):
+        with scenario(f"scenario-{i + 1}"):
+            # ⚡ Fast path: reuse the plan of a previously solved failure
+            known = known_fixes.lookup(error["context"]) if known_fixes else None
+            if known:
+                plan, score = known
+                print(f"⚡ Known fix found (similarity {score:.2f}) - skipping LLM")
+                handle_known_plan(plan)
+                continue
+
+            start = time.perf_counter()
+            llm_output = call_llm(prompt)
+            if known_fixes:
+                known_fixes.record_llm_call(time.perf_counter() - start)
+
+            # Only a valid plan whose tools all succeeded becomes a known fix
+            plan = handle_llm_plan_output(llm_output, usage=usage_tracker.scenario_totals())
+            if plan and known_fixes:
+                known_fixes.record(error["context"], plan)
+
+    print(usage_tracker.format_summary())
+    print(f"📁 Usage summary saved to {usage_tracker.save(TRACE_DIR)}")
+    if response_cache:
+        print(f"♻️ Response cache: {response_cache.stats()}")
+
+    if known_fixes:
+        summary = known_fixes.summary()
+        print(f"⚡ Known-fix hits: {summary['hits']}/{summary['lookups']} ({summary['hit_rate']:.0%})")
+        print(f"⏱️ Estimated LLM time saved: {summary['estimated_seconds_saved']:.1f}s")
 
-# Run each one
-for prompt in prompts:
-    llm_output = call_llm(prompt)
-    handle_llm_plan_output(llm_output)
+if __name__ == "__main__":
+    run_agent_pipeline()
@@ -1,16 +1,6 @@
-def generate_planned_actions_from_errors(error_list):
-    """
-    Generates prompts that ask an LLM to return:
-    1. Internal reasoning in a <trace> section with prompt_id and thoughts
-    2. A valid structured <start> ... <end> JSON response with planned actions
-
-    This format supports agent-level traceability and automation planning.
-    """
-    results = []
-
-    for error in error_list:
-
-        structured = f"""You are an AI DevOps planner.
+# Static planner instructions, built once per process. They go first and stay byte-identical
+# across errors so provider-side prompt caching can reuse them; only the log (user message) varies.
+SYSTEM_PROMPT = """You are an AI DevOps planner.
 
 Your job is to:
 1. Think step-by-step to understand the CI/CD failure in the log.
@@ -27,24 +17,24 @@ Your job is to:
 Return ONLY valid JSON inside <start> ... <end> like this:
 
 <start>
-{{
+{
   "planned_actions": [
-    {{
+    {
       "tool": string,      // e.g. "read_log"
-      "params": object,    // tool parameters like {{"mb": 512}}
+      "params": object,    // tool parameters like {"mb": 512}
       "when": string       // condition (see below)
-    }},
+    },
     ...
   ]
-}}
+}
 <end>
 
 🛠 Available tools:
-- "read_log" → params: {{}}
-- "increase_memory" → params: {{"mb": number}}
-- "rerun_test" → params: {{"test_id": number}}
-- "increase_timeout" → params: {{"seconds": number}}
-- "free_port" → params: {{"port": number}}
+- "read_log" → params: {}
+- "increase_memory" → params: {"mb": number}
+- "rerun_test" → params: {"test_id": number}
+- "increase_timeout" → params: {"seconds": number}
+- "free_port" → params: {"port": number}
 
 ⏱ Supported 'when' conditions:
 - "always"
@@ -63,13 +53,13 @@ Thought: Log shows delay in container response beyond threshold.
 Thought: Timeout suggests process needs more time or resources.
 </trace>
 <start>
-{{
+{
   "planned_actions": [
-    {{ "tool": "read_log", "params": {{}}, "when": "always" }},
-    {{ "tool": "increase_timeout", "params": {{"seconds": 60}}, "when": "on_timeout" }},
-    {{ "tool": "rerun_test", "params": {{"test_id": 102}}, "when": "after_timeout_in_fix" }}
+    { "tool": "read_log", "params": {}, "when": "always" },
+    { "tool": "increase_timeout", "params": {"seconds": 60}, "when": "on_timeout" },
+    { "tool": "rerun_test", "params": {"test_id": 102}, "when": "after_timeout_in_fix" }
   ]
-}}
+}
 <end>
 
 ⚠️ Constraints:
@@ -78,12 +68,43 @@ Thought: Timeout suggests process needs more time or resources.
 -🚫 Do NOT write anything after </end>. Not even explanations, justifications, or extra text.
 - If the log is unclear, return only:
 → "Not enough information to proceed."
+"""
 
-🔍 Jenkins Log:
+USER_TEMPLATE = """🔍 Jenkins Log:
 <start_log>
-{error["context"]}
+{context}
 <end_log>"""
 
-        results.append(structured)
+
+def build_messages(context: str) -> list:
+    """Chat messages for one error: the shared planner prompt, then the log."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_TEMPLATE.format(context=context)},
+    ]
+
+
+def generate_planned_actions_from_errors(error_list, max_context_tokens=None):
+    """
+    Generates chat messages (one list per error) that ask an LLM to return:
+    1. Internal reasoning in a <trace> section with prompt_id and thoughts
+    2. A valid structured <start> ... <end> JSON response with planned actions
+
+    This format supports agent-level traceability and automation planning.
+    The instructions are a static system prompt shared by every error; the log
+    context is the user message.
+    With max_context_tokens, each log context is packed to fit that token budget.
+    """
+    results = []
+
+    if max_context_tokens:
+        from modules.token_counter.context_packing import pack_context
+
+    for error in error_list:
+        context = error["context"]
+        if max_context_tokens:
+            context = pack_context(context, max_context_tokens)
+
+        results.append(build_messages(context))
 
     return results
@@ -1,11 +1,25 @@
 # tool_executor.py
 
+import asyncio
 import json
 import openai
 from datetime import datetime
 from pathlib import Path
 import re
 
+# Token accounting is shared with the rest of the project (needs the repo root on sys.path)
+try:
+    from modules.token_counter.usage import usage_tracker
+except ImportError:
+    usage_tracker = None
+
+# Opt-in response cache for temperature-0 calls (LLM_CACHE=1)
+try:
+    from modules.llm_client.cache import cached_chat_completion
+except ImportError:
+    def cached_chat_completion(**request):
+        return openai.chat.completions.create(**request)
+
 # 👇 Set your OpenAI key and model
 openai.api_key = "your-api-key-here"
 MODEL = "gpt-4o"
@@ -42,13 +56,16 @@ def run_tool(tool_name, params):
         print(f"⚠️ Unknown tool: {tool_name}")
         return None
 
-def save_reasoning_trace(messages, tool_calls=None, tool_results=None, ai_responses=None):
+def save_reasoning_trace(messages, tool_calls=None, tool_results=None, ai_responses=None, usage=None):
     """
     Saves the AI's reasoning process and tool calls for traceability.
-    Now captures the ACTUAL AI reasoning from OpenAI responses.
+    Now captures the ACTUAL AI reasoning from OpenAI responses,
+    plus the token usage of the scenario when given.
     """
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    trace_file = TRACE_DIR / f"trace_{timestamp}.txt"
+    now = datetime.now()
+    timestamp = now.strftime("%Y-%m-%d_%H-%M-%S")
+    # Microseconds keep traces of concurrent scenarios (async runtime) apart
+    trace_file = TRACE_DIR / f"trace_{timestamp}_{now.strftime('%f')}.txt"
     
     # Create comprehensive trace log
     trace_content = f"=== AI DevOps Agent Trace ===\n"
@@ -98,6 +115,12 @@ def save_reasoning_trace(messages, tool_calls=None, tool_results=None, ai_respon
     trace_content += f"Total AI reasoning iterations: {len(reasoning_steps)}\n"
     trace_content += f"Tools called: {len(tool_calls) if tool_calls else 0}\n"
     trace_content += f"Tools executed: {len(tool_results) if tool_results else 0}\n"
+
+    # Log token usage and estimated cost of the scenario
+    if usage:
+        trace_content += "\n=== Token Usage ===\n"
+        for key, value in usage.items():
+            trace_content += f"{key}: {value}\n"
     
     # Write to file for persistence with UTF-8 encoding
     try:
@@ -114,9 +137,11 @@ def save_reasoning_trace(messages, tool_calls=None, tool_results=None, ai_respon
 def execute_tool_calls(tool_calls):
     """
     Executes the tools that the AI decided to call.
-    Returns results that can be fed back to the AI for further reasoning.
+    Returns (results that can be fed back to the AI for further reasoning,
+    names of the tools that returned no result).
     """
     results = []
+    failed = []
     
     for tool_call in tool_calls:
         function_name = tool_call.function.name
@@ -127,6 +152,8 @@ def execute_tool_calls(tool_calls):
         
         # Execute the actual tool
         result = run_tool(function_name, function_args)
+        if result is None:
+            failed.append(function_name)
         
         # Create result object for OpenAI API
         tool_result = {
@@ -138,7 +165,7 @@ def execute_tool_calls(tool_calls):
         
         results.append(tool_result)
     
-    return results
+    return results, failed
 
 def should_continue_with_tools(response):
     """
@@ -148,6 +175,13 @@ def should_continue_with_tools(response):
     return (hasattr(response.choices[0].message, 'tool_calls') and 
             response.choices[0].message.tool_calls is not None)
 
+def run_completed(finished, failed_tools):
+    """
+    True when the AI finished on its own (not cut off by max_iterations) and
+    every tool it called returned a result - the only runs worth reusing as a known fix.
+    """
+    return finished and not failed_tools
+
 def handle_llm_plan_with_tools(api_request):
     """
     Main entry point for tool calling approach. Replaces the old
@@ -162,20 +196,24 @@ def handle_llm_plan_with_tools(api_request):
     # Track all tool calls and results for comprehensive logging
     all_tool_calls = []
     all_tool_results = []
+    failed_tools = []  # tools that returned no result (run_tool gives None)
     max_iterations = 5  # Prevent infinite loops
     iteration = 0
+    finished = False  # the AI stopped calling tools before max_iterations
     
     while iteration < max_iterations:
         print(f"\n🤖 AI Iteration {iteration + 1}")
         
         # Make API call with tool definitions
-        response = openai.chat.completions.create(
+        response = cached_chat_completion(
             model=MODEL,
             messages=messages,
             tools=api_request["tools"],
             tool_choice=api_request["tool_choice"],
             temperature=0
         )
+        if usage_tracker:
+            usage_tracker.record("tool_loop", MODEL, response, messages=messages)
         
         message = response.choices[0].message
         
@@ -192,8 +230,9 @@ def handle_llm_plan_with_tools(api_request):
             all_tool_calls.extend(tool_calls)
             
             # Execute the tools
-            tool_results = execute_tool_calls(tool_calls)
+            tool_results, failed = execute_tool_calls(tool_calls)
             all_tool_results.extend(tool_results)
+            failed_tools.extend(failed)
             
             # Add tool results to conversation for AI to see
             messages.extend(tool_results)
@@ -202,10 +241,12 @@ def handle_llm_plan_with_tools(api_request):
         else:
             # AI is done, break the loop
             print(f"✅ AI completed analysis: {message.content}")
+            finished = True
             break
     
     # Save comprehensive trace of the entire interaction
-    save_reasoning_trace(messages, all_tool_calls, all_tool_results)
+    usage = usage_tracker.scenario_totals() if usage_tracker else None
+    save_reasoning_trace(messages, all_tool_calls, all_tool_results, usage=usage)
     
     # Return summary of what was accomplished
     return {
@@ -213,7 +254,101 @@ def handle_llm_plan_with_tools(api_request):
         "tools_used": len(all_tool_calls),
         "iterations": iteration,
         "tool_calls": all_tool_calls,
-        "tool_results": all_tool_results
+        "tool_results": all_tool_results,
+        "completed": run_completed(finished, failed_tools),
+        "usage": usage
+    }
+
+async def handle_llm_plan_with_tools_async(api_request, runtime):
+    """
+    handle_llm_plan_with_tools() as a coroutine for modules.llm_client.async_runtime:
+    LLM calls go through runtime.chat (shared concurrency limit), tools run in a worker
+    thread so a slow tool never blocks the event loop. Same summary as the sync version.
+    """
+    messages = [
+        {"role": "system", "content": api_request["system_prompt"]},
+        {"role": "user", "content": api_request["user_message"]}
+    ]
+
+    all_tool_calls = []
+    all_tool_results = []
+    failed_tools = []
+    max_iterations = 5  # Prevent infinite loops
+    iteration = 0
+    finished = False
+
+    while iteration < max_iterations:
+        response = await runtime.chat(
+            messages,
+            MODEL,
+            stage="tool_loop",
+            tools=api_request["tools"],
+            tool_choice=api_request["tool_choice"],
+            temperature=0
+        )
+        message = response.choices[0].message
+        messages.append({
+            "role": "assistant",
+            "content": message.content,
+            "tool_calls": message.tool_calls if hasattr(message, 'tool_calls') else None
+        })
+
+        if should_continue_with_tools(response):
+            all_tool_calls.extend(message.tool_calls)
+            tool_results, failed = await asyncio.to_thread(execute_tool_calls, message.tool_calls)
+            all_tool_results.extend(tool_results)
+            failed_tools.extend(failed)
+            messages.extend(tool_results)
+            iteration += 1
+        else:
+            print(f"✅ AI completed analysis: {message.content}")
+            finished = True
+            break
+
+    usage = usage_tracker.scenario_totals() if usage_tracker else None
+    save_reasoning_trace(messages, all_tool_calls, all_tool_results, usage=usage)
+
+    return {
+        "final_response": messages[-1]["content"] if messages else "No response",
+        "tools_used": len(all_tool_calls),
+        "iterations": iteration,
+        "tool_calls": all_tool_calls,
+        "tool_results": all_tool_results,
+        "completed": run_completed(finished, failed_tools),
+        "usage": usage
+    }
+
+def serialize_tool_calls(tool_calls):
+    """
+    Converts OpenAI tool call objects into plain dicts ({"name", "arguments"})
+    so a successful run can be stored as a known fix.
+    """
+    return [
+        {"name": call.function.name, "arguments": json.loads(call.function.arguments)}
+        for call in tool_calls
+    ]
+
+def replay_tool_calls(recorded_calls):
+    """
+    Re-runs the tool calls of a known fix without calling the LLM.
+    Returns the same summary shape as handle_llm_plan_with_tools.
+    """
+    tool_results = []
+    failed_tools = []
+    for call in recorded_calls:
+        print(f"🔧 Replaying tool: {call['name']} with args: {call['arguments']}")
+        result = run_tool(call["name"], call["arguments"])
+        if result is None:
+            failed_tools.append(call["name"])
+        tool_results.append({"role": "tool", "name": call["name"], "content": str(result)})
+
+    return {
+        "final_response": "Reused known fix (no LLM call)",
+        "tools_used": len(recorded_calls),
+        "iterations": 0,
+        "tool_calls": recorded_calls,
+        "tool_results": tool_results,
+        "completed": run_completed(True, failed_tools)
     }
 
 # Legacy function name for backward compatibility
@@ -123,35 +123,45 @@ Consider when each tool should be used:
 - If logs are unclear, indicate insufficient information
 - Prioritize the most likely solution first"""
 
-def generate_planned_actions_from_errors(error_list):
+def iter_planned_actions_from_errors(error_list, max_context_tokens=None):
     """
-    Generates system prompts and user messages for tool calling approach.
-    Returns structured data for OpenAI API calls instead of text parsing.
+    Lazily yields one OpenAI API request per error, as the errors are consumed.
+    Accepts any iterable (e.g. a generator reading a large backfill), so requests
+    can feed a bounded-concurrency LLM stage without building the full list first.
+    With max_context_tokens, each log context is packed to fit that token budget.
     """
-    results = []
-    
     # Get the tool definitions once
     tools = get_devops_tools()
     system_prompt = generate_devops_system_prompt()
+
+    if max_context_tokens:
+        from modules.token_counter.context_packing import pack_context
     
     for error in error_list:
+        context = error["context"]
+        if max_context_tokens:
+            context = pack_context(context, max_context_tokens)
+
         # Create user message with the specific error context
         user_message = f"""Analyze this CI/CD failure and use the appropriate tools to fix it:
 
 🔍 Jenkins Log:
-{error["context"]}
+{context}
 
 Please analyze the error and call the necessary tools to resolve the issue."""
 
         # Structure the request for OpenAI API
-        api_request = {
+        yield {
             "system_prompt": system_prompt,
             "user_message": user_message, 
             "tools": tools,
             "tool_choice": "auto"  # Let AI decide which tools to use
         }
-        
-        results.append(api_request)
-    
-    return results
 
+def generate_planned_actions_from_errors(error_list, max_context_tokens=None):
+    """
+    Generates system prompts and user messages for tool calling approach.
+    Returns structured data for OpenAI API calls instead of text parsing.
+    List version of iter_planned_actions_from_errors.
+    """
+    return list(iter_planned_actions_from_errors(error_list, max_context_tokens))
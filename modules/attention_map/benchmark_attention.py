@@ -0,0 +1,85 @@
+"""
+Benchmark: fp32 vs int8 fast mode (and output vs hook capture) for attention extraction on CPU.
+
+On a fixed set of inputs (the pipelines' example error contexts, flattened to one line
+each), reports for every mode:
+- latency:    median seconds for one input
+- throughput: inputs/s with batched extract_attention
+- fidelity:   Pearson correlation of each attention map against fp32 "outputs" capture
+              (real tokens only), mean and minimum over inputs, layers and heads
+
+Run from the repository root:
+    python -m modules.attention_map.benchmark_attention --inputs 64 --layers 0 5 11
+"""
+
+import argparse
+import statistics
+import time
+
+import numpy as np
+
+from modules.attention_map.logic import configure_threads, extract_attention, load_model
+from modules.token_counter.example_data import PIPELINE_FILES, load_example_errors
+
+MODES = [
+    ("fp32 outputs", {"capture": "outputs", "fast": False}),
+    ("fp32 hooks", {"capture": "hooks", "fast": False}),
+    ("int8 outputs", {"capture": "outputs", "fast": True}),
+    ("int8 hooks", {"capture": "hooks", "fast": True}),
+]
+
+
+def load_inputs(count: int) -> list:
+    contexts = [error["context"] for path in PIPELINE_FILES for error in load_example_errors(path)]
+    lines = [" ".join(context.split()) for context in contexts]
+    return (lines * (count // len(lines) + 1))[:count]
+
+
+def correlations(reference: dict, result: dict) -> list:
+    values = []
+    for i, mask in enumerate(reference["mask"]):
+        n = int(mask.sum())
+        for l in range(len(reference["layers"])):
+            for h in range(len(reference["heads"])):
+                a = reference["attentions"][i, l, h, :n, :n].ravel()
+                b = result["attentions"][i, l, h, :n, :n].ravel()
+                values.append(float(np.corrcoef(a, b)[0, 1]))
+    return values
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--inputs", type=int, default=64)
+    parser.add_argument("--layers", type=int, nargs="+", default=[0, 5, 11])
+    parser.add_argument("--heads", type=int, nargs="+", default=None, help="Default: all heads")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--latency-runs", type=int, default=10)
+    args = parser.parse_args()
+
+    texts = load_inputs(args.inputs)
+    print(f"🧵 {configure_threads()} intra-op threads, {len(texts)} inputs, layers {args.layers}")
+
+    reference = None
+    for label, options in MODES:
+        load_model(quantized=options["fast"])  # load (and quantise) outside the timings
+        extract_attention(texts[:1], args.layers, args.heads, **options)
+
+        latencies = []
+        for text in texts[:args.latency_runs]:
+            start = time.perf_counter()
+            extract_attention([text], args.layers, args.heads, **options)
+            latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        result = extract_attention(texts, args.layers, args.heads, batch_size=args.batch_size, **options)
+        throughput = len(texts) / (time.perf_counter() - start)
+
+        if reference is None:
+            reference = result
+        fidelity = correlations(reference, result)
+        print(f"• {label:<13} latency {statistics.median(latencies) * 1000:7.1f} ms | "
+              f"{throughput:7.1f} inputs/s | correlation vs fp32 mean {np.mean(fidelity):.4f}, min {np.min(fidelity):.4f}")
+
+
+if __name__ == "__main__":
+    main()
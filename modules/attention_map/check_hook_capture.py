@@ -0,0 +1,86 @@
+"""
+Check: hook capture returns the same attention maps as output_attentions=True.
+
+Builds a tiny randomly initialised BERT (no download) and, for a few layer/head selections
+(including negative indices), compares _capture_with_hooks against the selected maps of
+output_attentions=True on a padded batch. Also checks that the hooked pass stops after the
+deepest requested layer. Exits with status 1 on a mismatch.
+
+Run from the repository root:
+    python -m modules.attention_map.check_hook_capture
+"""
+
+import argparse
+import sys
+
+import torch
+from transformers import BertConfig, BertModel
+
+from modules.attention_map.logic import _capture_with_hooks, _selection
+
+SELECTIONS = [
+    (None, None),
+    ([0, -1], [1, -1]),
+    ([1], [0]),
+    ([2, 0], [3, 2]),
+]
+
+
+def tiny_model(layers: int, heads: int) -> BertModel:
+    config = BertConfig(vocab_size=128, hidden_size=16 * heads, num_hidden_layers=layers, num_attention_heads=heads,
+                        intermediate_size=32 * heads, attn_implementation="eager")
+    model = BertModel(config)
+    model.eval()
+    return model
+
+
+def padded_batch(lengths: list, vocab_size: int) -> tuple:
+    seq = max(lengths)
+    input_ids = torch.randint(1, vocab_size, (len(lengths), seq))
+    attention_mask = torch.zeros(len(lengths), seq, dtype=torch.long)
+    for row, length in enumerate(lengths):
+        attention_mask[row, :length] = 1
+        input_ids[row, length:] = 0
+    return input_ids, attention_mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--layers", type=int, default=4)
+    parser.add_argument("--heads", type=int, default=4)
+    parser.add_argument("--lengths", type=int, nargs="+", default=[5, 17, 12])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    torch.manual_seed(args.seed)
+    model = tiny_model(args.layers, args.heads)
+    input_ids, attention_mask = padded_batch(args.lengths, model.config.vocab_size)
+
+    failures = 0
+    for requested_layers, requested_heads in SELECTIONS:
+        layers, heads = _selection(model, requested_layers, requested_heads)
+        ran = []
+        handles = [block.register_forward_hook(lambda module, inputs, output, i=i: ran.append(i))
+                   for i, block in enumerate(model.encoder.layer)]
+        with torch.inference_mode():
+            hooked = _capture_with_hooks(model, input_ids, attention_mask, layers, heads)
+            for handle in handles:
+                handle.remove()
+            outputs = model(input_ids=input_ids, attention_mask=attention_mask, output_attentions=True)
+        expected = torch.stack([outputs.attentions[layer][:, heads] for layer in layers], dim=1)
+
+        difference = (hooked - expected).abs().max().item()
+        stopped = max(ran, default=-1) < max(layers)  # the deepest layer is aborted inside its attention
+        ok = hooked.shape == expected.shape and difference < 1e-5 and stopped
+        failures += not ok
+        print(f"{'✅' if ok else '❌'} layers {requested_layers} -> {layers}, heads {requested_heads} -> {heads}: "
+              f"max difference {difference:.2e}, layers completed {sorted(set(ran))}")
+
+    if failures:
+        print(f"❌ {failures} of {len(SELECTIONS)} selections differ")
+        sys.exit(1)
+    print(f"✅ Hook capture matches output_attentions=True for all {len(SELECTIONS)} selections")
+
+
+if __name__ == "__main__":
+    main()
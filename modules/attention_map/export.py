@@ -0,0 +1,119 @@
+"""
+Headless export of attention heatmaps (no display needed, e.g. in CI).
+
+One forward pass per batch of inputs (extract_attention), then one figure per input
+with a grid of the selected layers (rows) x heads (columns), written as PNG and/or SVG.
+Figures are rendered with the non-interactive Agg canvas in parallel worker processes.
+
+Run from the repository root:
+    python -m modules.attention_map.export --input failing_lines.txt --output-dir attention_reports
+    python -m modules.attention_map.export --text "Error: Connection refused" --layers 0 11 --heads 0 1 2 --formats png svg
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import seaborn as sns
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from modules.attention_map.logic import extract_attention
+
+DEFAULT_FORMATS = ("png",)
+CELL_INCHES = 2.5        # size of one (layer, head) heatmap in the grid
+MAX_LABELED_TOKENS = 40  # token labels are only drawn on single maps with at most this many tokens
+
+
+def render_attention_grid(attentions, tokens: list, layers: list, heads: list, path_stem: str,
+                          formats=DEFAULT_FORMATS, title: str = "") -> list:
+    """
+    Renders a (layers x heads) grid of heatmaps for one input and saves it in every format.
+    `attentions` is (layers, heads, seq, seq), already cut to the real tokens.
+    Uses the Agg canvas directly, so it never touches a GUI backend. Returns the written paths.
+    """
+    rows, cols = len(layers), len(heads)
+    figure = Figure(figsize=(max(cols * CELL_INCHES, 6), max(rows * CELL_INCHES, 5)))
+    FigureCanvasAgg(figure)
+    axes = figure.subplots(rows, cols, squeeze=False)
+
+    labeled = rows == cols == 1 and len(tokens) <= MAX_LABELED_TOKENS
+    for r, layer in enumerate(layers):
+        for c, head in enumerate(heads):
+            ax = axes[r][c]
+            sns.heatmap(
+                attentions[r, c], ax=ax, cmap="viridis", cbar=labeled, square=True,
+                xticklabels=tokens if labeled else False, yticklabels=tokens if labeled else False
+            )
+            ax.set_title(f"Layer {layer} Head {head}", fontsize=8)
+
+    if title:
+        figure.suptitle(title, fontsize=10)
+    figure.tight_layout()
+
+    paths = []
+    for fmt in formats:
+        path = f"{path_stem}.{fmt}"
+        figure.savefig(path, format=fmt)
+        paths.append(path)
+    return paths
+
+
+def export_attention(texts, output_dir="./attention_reports", layers=None, heads=None,
+                     formats=DEFAULT_FORMATS, workers: int = None, capture: str = "outputs") -> list:
+    """
+    Writes one attention grid per text to `output_dir` (attention_0000.png, ...) plus an
+    index.json mapping each text to its files. Rendering runs in `workers` processes
+    (one per CPU core by default, 1 = in this process). Returns the index entries.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    result = extract_attention(texts, layers=layers, heads=heads, capture=capture)
+
+    jobs = []
+    for i, text in enumerate(texts):
+        n = int(result["mask"][i].sum())
+        jobs.append((
+            result["attentions"][i, :, :, :n, :n], result["tokens"][i], result["layers"], result["heads"],
+            str(output_dir / f"attention_{i:04d}"), tuple(formats), text[:80]
+        ))
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        written = [render_attention_grid(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            written = list(pool.map(render_attention_grid, *zip(*jobs)))
+
+    index = [{"text": text, "files": paths} for text, paths in zip(texts, written)]
+    (output_dir / "index.json").write_text(json.dumps(index, indent=2), encoding="utf-8")
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", help="Text file with one input (e.g. a log line) per line")
+    parser.add_argument("--text", nargs="*", default=[], help="Inputs given on the command line")
+    parser.add_argument("--output-dir", default="./attention_reports")
+    parser.add_argument("--layers", type=int, nargs="+", help="Layers to render (default: all)")
+    parser.add_argument("--heads", type=int, nargs="+", help="Heads to render (default: all)")
+    parser.add_argument("--formats", nargs="+", default=list(DEFAULT_FORMATS), choices=["png", "svg"])
+    parser.add_argument("--workers", type=int, help="Rendering processes (default: one per CPU core)")
+    parser.add_argument("--capture", default="outputs", choices=["outputs", "hooks"],
+                        help="hooks: compute only the selected layers/heads (faster for a few maps)")
+    args = parser.parse_args()
+
+    texts = list(args.text)
+    if args.input:
+        texts += [line for line in Path(args.input).read_text(encoding="utf-8").splitlines() if line.strip()]
+    if not texts:
+        parser.error("no inputs: pass --input and/or --text")
+
+    index = export_attention(texts, args.output_dir, args.layers, args.heads, args.formats, args.workers, args.capture)
+    print(f"✅ Exported {sum(len(entry['files']) for entry in index)} files for {len(index)} inputs to {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,290 @@
-from transformers import BertTokenizer, BertModel
+import math
+import os
+from functools import lru_cache
+
+from transformers import BertTokenizerFast, BertModel
 import torch
+import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
-def display_attention(text, layer=0, head=0):
+MODEL_NAME = "bert-base-uncased"
+MAX_LENGTH = 512        # BERT's position limit
+DEFAULT_BATCH_SIZE = 32
+DEFAULT_WINDOW_OVERLAP = 128  # tokens shared by consecutive windows
+# Memory (MB) the attention maps of one batch of windows may take; sizes the default window batch
+WINDOW_BATCH_MB = float(os.getenv("ATTENTION_WINDOW_BATCH_MB", "256"))
+
+# "outputs": output_attentions=True (every layer and head is materialised)
+# "hooks":   forward hooks on the requested layers only, stopping after the deepest one
+CAPTURE_MODES = ("outputs", "hooks")
 
-    tokenizer = BertTokenizer.from_pretrained("bert-base-uncased")
-    model = BertModel.from_pretrained("bert-base-uncased", output_attentions=True)
+# Set ATTENTION_MAP_FAST=1 (or pass fast=True) on CPU-only boxes: int8 dynamic quantisation
+# of the Linear layers and intra-op threads sized to the available cores
+FAST_MODE = os.getenv("ATTENTION_MAP_FAST", "0") == "1"
+
+
+def configure_threads(num_threads: int = None):
+    """
+    Sizes PyTorch's CPU thread pools: one intra-op thread per available core (respecting
+    the process's CPU affinity, e.g. in containers) and a single inter-op thread, since
+    a BERT forward pass is one chain of ops.
+    """
+    if not num_threads:
+        num_threads = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count() or 1
+    torch.set_num_threads(num_threads)
+    try:
+        torch.set_num_interop_threads(1)
+    except RuntimeError:
+        pass  # can only be set once, before any inter-op work
+    return num_threads
+
+
+@lru_cache(maxsize=None)
+def load_model(model_name: str = MODEL_NAME, quantized: bool = False):
+    """
+    Loads the tokenizer and model once per process (~440 MB of weights) and reuses them.
+    With quantized=True, the Linear layers get dynamic int8 quantisation (CPU only).
+    Returns (tokenizer, model).
+    """
+    tokenizer = BertTokenizerFast.from_pretrained(model_name)
+    # output_attentions is requested per call, so hook captures can use the fast attention kernels
+    model = BertModel.from_pretrained(model_name)
     model.eval()
+    if quantized:
+        configure_threads()
+        model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return tokenizer, model
+
+
+class _StopForward(Exception):
+    """Raised from a hook once the deepest requested layer has been captured."""
+
+
+def _capture_with_hooks(model, input_ids, attention_mask, layers: list, heads: list):
+    """
+    Attention probabilities of the requested layers and heads only.
+
+    Forward hooks keep the query/key projections of those layers (requested heads only),
+    and the forward pass is aborted right after the deepest one. The maps are then
+    recomputed as BERT does: softmax(QK^T / sqrt(head_size) + padding mask).
+    Returns a (batch, layers, heads, seq, seq) tensor.
+    """
+    head_size = model.config.hidden_size // model.config.num_attention_heads
+    batch, seq = input_ids.shape
+    deepest = max(layers)
+    captured = {}
+
+    def make_hook(layer, name):
+        def hook(module, inputs, output):
+            # (batch, seq, hidden) -> (batch, heads, seq, head_size), requested heads only
+            captured[layer, name] = output.view(batch, seq, -1, head_size)[:, :, heads].transpose(1, 2)
+            if layer == deepest and (layer, "query") in captured and (layer, "key") in captured:
+                raise _StopForward
+        return hook
+
+    handles = []
+    for layer in set(layers):
+        self_attention = model.encoder.layer[layer].attention.self
+        handles.append(self_attention.query.register_forward_hook(make_hook(layer, "query")))
+        handles.append(self_attention.key.register_forward_hook(make_hook(layer, "key")))
+    try:
+        model(input_ids=input_ids, attention_mask=attention_mask, output_attentions=False)
+    except _StopForward:
+        pass
+    finally:
+        for handle in handles:
+            handle.remove()
+
+    additive_mask = (1.0 - attention_mask[:, None, None, :].float()) * torch.finfo(torch.float32).min
+    maps = []
+    for layer in layers:
+        scores = captured[layer, "query"] @ captured[layer, "key"].transpose(-1, -2) / math.sqrt(head_size)
+        maps.append((scores + additive_mask).softmax(dim=-1))
+    return torch.stack(maps, dim=1)
+
+
+def _attention_batches(tokenizer, model, id_lists: list, layers: list, heads: list, capture: str, batch_size: int):
+    """
+    Runs the token id lists through the model in padded batches of similar length.
+    Yields (indices into id_lists, (batch, layers, heads, seq, seq) NumPy array).
+    """
+    if capture not in CAPTURE_MODES:
+        raise ValueError(f"❌ Unknown capture mode '{capture}' (expected one of {CAPTURE_MODES})")
+
+    # Similar lengths in the same batch -> little padding
+    order = sorted(range(len(id_lists)), key=lambda i: len(id_lists[i]))
+    for start in range(0, len(order), batch_size):
+        batch = order[start:start + batch_size]
+        inputs = tokenizer.pad({"input_ids": [id_lists[i] for i in batch]}, return_tensors="pt")
+        with torch.inference_mode():
+            if capture == "hooks":
+                selected = _capture_with_hooks(model, inputs["input_ids"], inputs["attention_mask"], layers, heads)
+            else:
+                outputs = model(input_ids=inputs["input_ids"], attention_mask=inputs["attention_mask"],
+                                output_attentions=True)
+                selected = torch.stack([outputs.attentions[layer][:, heads] for layer in layers], dim=1)
+        yield batch, selected.numpy()
+
+
+def _indices(selected, count: int, kind: str) -> list:
+    """0..count-1 when nothing is selected; negative indices count from the end (-1 = the last one)."""
+    if selected is None:
+        return list(range(count))
+    indices = []
+    for index in selected:
+        if not -count <= index < count:
+            raise ValueError(f"❌ {kind} {index} out of range: the model has {count} {kind}s")
+        indices.append(index % count)
+    return indices
 
-    inputs = tokenizer(text, return_tensors="pt")
-    input_ids = inputs["input_ids"]
 
-    
-    with torch.no_grad():
-        outputs = model(**inputs)
-        attentions = outputs.attentions  
+def _selection(model, layers, heads) -> tuple:
+    config = model.config
+    return _indices(layers, config.num_hidden_layers, "layer"), _indices(heads, config.num_attention_heads, "head")
 
 
-    attention_matrix = attentions[layer][0, head].numpy()  # (seq_len, seq_len)
+def _window_batch_size(model, layers: list, heads: list, window: int, capture: str) -> int:
+    """
+    Windows per batch so that the float32 maps held for it stay within WINDOW_BATCH_MB: the
+    selected layers/heads with hooks, every layer and head with output_attentions.
+    All 12x12 maps of one 512-token window already take ~150 MB, so that case runs one window at a time.
+    """
+    if capture == "outputs":
+        maps = model.config.num_hidden_layers * model.config.num_attention_heads
+    else:
+        maps = len(layers) * len(heads)
+    window_bytes = maps * window * window * 4
+    return max(1, min(DEFAULT_BATCH_SIZE, int(WINDOW_BATCH_MB * 2 ** 20 // window_bytes)))
 
 
-    tokens = tokenizer.convert_ids_to_tokens(input_ids[0])
+def extract_attention(texts, layers=None, heads=None, batch_size: int = DEFAULT_BATCH_SIZE,
+                      model_name: str = MODEL_NAME, capture: str = "outputs", fast: bool = FAST_MODE) -> dict:
+    """
+    Attention maps for many texts, one forward pass per padded batch.
+
+    `layers` / `heads` select which maps to keep (all by default). Texts are batched by
+    length to keep padding small, and truncated to 512 tokens. With capture="hooks" only
+    the requested layers/heads are computed and the pass stops after the deepest layer,
+    which cuts memory and latency when few maps are needed. fast=True uses the int8 model.
+
+    Returns a dict of NumPy arrays, in input order:
+    - "attentions": (texts, layers, heads, seq, seq) float32, zero outside the mask
+    - "mask":       (texts, seq) bool, True for real (non-padding) tokens
+    - "tokens":     list of token lists (without padding)
+    - "layers", "heads": the selected indices (negative ones counted from the end)
+    """
+    if isinstance(texts, str):
+        texts = [texts]
+    tokenizer, model = load_model(model_name, quantized=fast)
+    layers, heads = _selection(model, layers, heads)
+
+    encodings = tokenizer(list(texts), truncation=True, max_length=MAX_LENGTH)
+    lengths = [len(ids) for ids in encodings["input_ids"]]
+    seq_len = max(lengths, default=0)
+
+    attentions = np.zeros((len(texts), len(layers), len(heads), seq_len, seq_len), dtype=np.float32)
+    mask = np.zeros((len(texts), seq_len), dtype=bool)
+
+    batches = _attention_batches(tokenizer, model, encodings["input_ids"], layers, heads, capture, batch_size)
+    for batch, selected in batches:
+        for row, i in enumerate(batch):
+            n = lengths[i]
+            attentions[i, :, :, :n, :n] = selected[row, :, :, :n, :n]
+            mask[i, :n] = True
+
+    return {
+        "attentions": attentions,
+        "mask": mask,
+        "tokens": [tokenizer.convert_ids_to_tokens(ids) for ids in encodings["input_ids"]],
+        "layers": layers,
+        "heads": heads,
+    }
+
+
+def extract_windowed_attention(text: str, layers=None, heads=None, window: int = MAX_LENGTH,
+                               overlap: int = DEFAULT_WINDOW_OVERLAP, batch_size: int = None,
+                               model_name: str = MODEL_NAME, capture: str = "hooks", fast: bool = FAST_MODE) -> dict:
+    """
+    Attention for texts longer than BERT's 512 tokens, stored as a banded global view.
+
+    The text's tokens are split into overlapping windows ([CLS] + up to window-2 tokens + [SEP],
+    consecutive windows sharing `overlap` tokens), which run through the model as batches.
+    By default a batch holds as many windows as fit in WINDOW_BATCH_MB for the selected
+    layers/heads (one window when all maps are kept).
+    Each token keeps its query row from the window where it is most central, so its keys
+    are the tokens of that window. Memory grows linearly with the text length.
+
+    Returns a dict (NumPy arrays, N = tokens of the text, C = window - 2):
+    - "rows":        (layers, heads, N, C) float32, attention of token i over the keys
+                     key_offsets[i] .. key_offsets[i] + C - 1 (zero past the end of the text)
+    - "special":     (layers, heads, N) float32, attention of token i on its window's [CLS] and [SEP]
+    - "key_offsets": (N,) int, global index of the first key of each row
+    - "tokens":      the N tokens (without special tokens)
+    - "layers", "heads": the selected indices
+    Use to_dense() to expand one (layer, head) map for short texts.
+    """
+    tokenizer, model = load_model(model_name, quantized=fast)
+    layers, heads = _selection(model, layers, heads)
+    content = window - 2
+    if not 0 <= overlap < content:
+        raise ValueError(f"❌ overlap must be between 0 and {content - 1} for a window of {window}")
+    batch_size = batch_size or _window_batch_size(model, layers, heads, window, capture)
+
+    ids = tokenizer(text, add_special_tokens=False)["input_ids"]
+    n = len(ids)
+    step = content - overlap
+    starts = list(range(0, max(n - overlap, 1), step))
+    windows = [[tokenizer.cls_token_id] + ids[start:start + content] + [tokenizer.sep_token_id] for start in starts]
+
+    # Owner window of every token: the one where it is furthest from both edges
+    owner = np.zeros(n, dtype=np.int64)
+    centrality = np.full(n, -1, dtype=np.int64)
+    for w, start in enumerate(starts):
+        positions = np.arange(start, min(start + content, n))
+        distance = np.minimum(positions - start, start + content - 1 - positions)
+        better = distance > centrality[positions]
+        owner[positions[better]] = w
+        centrality[positions[better]] = distance[better]
+    key_offsets = np.array(starts, dtype=np.int64)[owner] if n else np.zeros(0, dtype=np.int64)
+
+    rows = np.zeros((len(layers), len(heads), n, content), dtype=np.float32)
+    special = np.zeros((len(layers), len(heads), n), dtype=np.float32)
+    for batch, selected in _attention_batches(tokenizer, model, windows, layers, heads, capture, batch_size):
+        for row, w in enumerate(batch):
+            length = len(windows[w]) - 2
+            tokens = np.nonzero(owner == w)[0]
+            queries = tokens - starts[w] + 1                      # +1 for [CLS]
+            maps = selected[row][:, :, queries]                    # (layers, heads, tokens, window_seq)
+            rows[:, :, tokens, :length] = maps[:, :, :, 1:length + 1]
+            special[:, :, tokens] = maps[:, :, :, 0] + maps[:, :, :, length + 1]
+
+    return {
+        "rows": rows,
+        "special": special,
+        "key_offsets": key_offsets,
+        "tokens": tokenizer.convert_ids_to_tokens(ids),
+        "layers": layers,
+        "heads": heads,
+    }
+
+
+def to_dense(windowed: dict, layer_index: int = 0, head_index: int = 0) -> np.ndarray:
+    """Expands one (layer, head) map of extract_windowed_attention into an (N, N) matrix."""
+    rows = windowed["rows"][layer_index, head_index]
+    n, content = rows.shape
+    dense = np.zeros((n, n), dtype=np.float32)
+    for i, offset in enumerate(windowed["key_offsets"]):
+        width = min(content, n - offset)
+        dense[i, offset:offset + width] = rows[i, :width]
+    return dense
+
+
+def display_attention(text, layer=0, head=0):
+
+    result = extract_attention([text], layers=[layer], heads=[head], capture="hooks")
+    attention_matrix = result["attentions"][0, 0, 0]  # (seq_len, seq_len)
+    tokens = result["tokens"][0]
 
 
     plt.figure(figsize=(10, 8))
@@ -38,10 +301,9 @@ def display_attention(text, layer=0, head=0):
 if __name__ == "__main__":
     sentence = input("Enter a sentence: ")
     layer= int(input("Enter a layer: "))
-    head= int(input("Enter a head: ")) 
+    head= int(input("Enter a head: "))
     try:
         display_attention(sentence, layer=layer, head=head)
     except Exception as e:
         print(f"Error: {e}")
 
-
@@ -1,14 +1,6 @@
-def generate_structured_prompts_from_errors(error_list):
-    """
-    Takes a list of error dictionaries (from Jenkins log parsing)
-    and returns a list of structured prompts formatted for an LLM.
-    Each prompt includes role definition, task description, and log context.
-    """
-    results = []
-
-    for error in error_list:
-
-          structured = f"""You are an expert DevOps assistant specializing in analyzing CI/CD logs and generating structured outputs for failure diagnosis and repair.
+# Static instructions, built once per process. They go first and stay byte-identical across
+# errors so provider-side prompt caching can reuse them; only the log (user message) varies.
+SYSTEM_PROMPT = """You are an expert DevOps assistant specializing in analyzing CI/CD logs and generating structured outputs for failure diagnosis and repair.
 
 Your task:
 1. Think step-by-step to understand the failure (internally).
@@ -34,11 +26,11 @@ Thought: Error line refers to the Groovy compiler, possibly a syntax issue.
 Thought: Multiple addError calls suggest a compilation failure.
 </trace>
 <start>
-{{
+{
   "failed_step": "Compile",
   "error_summary": "2025-08-05 13:21:00 Groovy script failed to compile due to syntax error.",
   "suggested_fix_prompt": "Check the syntax in the Jenkinsfile and verify correct usage of Groovy methods."
-}}
+}
 <end>
 
 Constraints:
@@ -46,15 +38,50 @@ Constraints:
 - Do not invent or infer missing details.
 - If the log does not contain enough information, return:
   "Not enough information to proceed."
+"""
 
-Input log:
+USER_TEMPLATE = """Input log:
 <start_log>
-{error["context"]}
+{context}
 <end_log>
 """
-        results.append(structured)
 
-    return results
+
+def build_messages(context: str) -> list:
+    """Chat messages for one error: the shared system prompt, then the log."""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": USER_TEMPLATE.format(context=context)},
+    ]
+
+
+def iter_structured_prompts_from_errors(error_list, max_context_tokens=None):
+    """
+    Lazily yields the chat messages for each error, as the errors are consumed.
+    Accepts any iterable (e.g. a generator reading a large backfill), so prompts
+    can feed a bounded-concurrency LLM stage without building the full list first.
+    With max_context_tokens, each log context is packed to fit that token budget.
+    """
+    if max_context_tokens:
+        from modules.token_counter.context_packing import pack_context
+
+    for error in error_list:
+        context = error["context"]
+        if max_context_tokens:
+            context = pack_context(context, max_context_tokens)
+
+        yield build_messages(context)
+
+
+def generate_structured_prompts_from_errors(error_list, max_context_tokens=None):
+    """
+    Takes a list of error dictionaries (from Jenkins log parsing)
+    and returns one list of chat messages per error, formatted for an LLM:
+    a static system prompt (role definition, task description) followed by
+    a user message with the log context.
+    List version of iter_structured_prompts_from_errors.
+    """
+    return list(iter_structured_prompts_from_errors(error_list, max_context_tokens))
 
 # error_list = [{'stage': None, 'error_line': 'at org.codehaus.groovy.control.ErrorCollector.failIfErrors(ErrorCollector.java:309)', 'context': '\nat org.codehaus.groovy.control.ErrorCollector.failIfErrors(ErrorCollector.java:309)\nat org.codehaus.groovy.control.ErrorCollector.addFatalError(ErrorCollector.java:149)\nat org.codehaus.groovy.control.ErrorCollector.addError(ErrorCollector.java:119)\nat org.codehaus.groovy.control.ErrorCollector.addError(ErrorCollector.java:131)'}]
 
@@ -0,0 +1,166 @@
+"""
+Registry of ReAct actions: declared signatures, one precompiled parser, per-action timeouts.
+
+An agent registers each action once, with the names of its (quoted string) arguments:
+
+    actions = ActionRegistry()
+    actions.control("ask_user", "question")          # handled by the agent loop itself
+
+    @actions.action("search_error", "keyword", timeout_s=10)
+    def search_error(context, keyword): ...
+
+parse() turns an Action line such as  search_error("NullPointerException")  into
+("search_error", ["NullPointerException"]) with one precompiled grammar. A line that doesn't
+fit (unknown name, missing quotes, wrong number of arguments) raises ActionError, whose
+message tells the model what was wrong and what the action looks like, so the next step can
+fix it instead of guessing after a bare "Unknown action".
+
+run() calls the handler with a context dict (whatever the agent passes: log text, output
+store, ...) in a worker thread and gives up after the action's timeout (ACTION_TIMEOUT_S by
+default). A handler that times out or raises yields an error observation, never an exception.
+"""
+
+import asyncio
+import os
+import re
+import threading
+
+# Seconds an action handler may take before its observation becomes a timeout (0 = no limit)
+ACTION_TIMEOUT_S = float(os.getenv("ACTION_TIMEOUT_S", "30"))
+
+# name, optionally followed by (arguments); a bare name counts as a call without arguments
+ACTION_GRAMMAR = re.compile(r"\s*(?P<name>[A-Za-z_]\w*)\s*(?:\((?P<args>.*)\))?\s*", re.DOTALL)
+# one "double" or 'single' quoted argument with backslash escapes, then a comma or the end
+ARGUMENT = re.compile(r"""\s*(?:"(?P<double>(?:[^"\\]|\\.)*)"|'(?P<single>(?:[^'\\]|\\.)*)')\s*(?:,|\Z)""", re.DOTALL)
+ESCAPE = re.compile(r"\\(.)", re.DOTALL)
+
+
+class ActionError(ValueError):
+    """An Action line the registry can't run; str() is the observation shown to the model."""
+
+    def __init__(self, action: str, reason: str, usage: str):
+        self.action = action
+        self.reason = reason
+        self.usage = usage
+        super().__init__(f"❌ Invalid action '{action}': {reason}. {usage}")
+
+
+class Action:
+    def __init__(self, name: str, params: tuple = (), handler=None, timeout_s: float = ACTION_TIMEOUT_S):
+        self.name = name
+        self.params = tuple(params)
+        self.handler = handler      # None: a control action (ask_user, suggest_fix) the agent loop handles
+        self.timeout_s = timeout_s
+
+    @property
+    def signature(self) -> str:
+        params = ", ".join(f'"<{param}>"' for param in self.params)
+        return f"{self.name}({params})"
+
+
+class ActionRegistry:
+    def __init__(self):
+        self.actions = {}
+
+    def action(self, name: str, *params: str, timeout_s: float = ACTION_TIMEOUT_S):
+        """Decorator: registers `handler(context, *args)` as the action `name(params...)`."""
+        def register(handler):
+            self.actions[name] = Action(name, params, handler, timeout_s)
+            return handler
+        return register
+
+    def control(self, name: str, *params: str):
+        """Registers an action without a handler: parsed and validated here, acted on by the agent loop."""
+        self.actions[name] = Action(name, params)
+
+    def signatures(self) -> str:
+        """e.g. 'read_log(), search_error("<keyword>")' – for the system prompt."""
+        return ", ".join(action.signature for action in self.actions.values())
+
+    def parse(self, text: str) -> tuple:
+        """(name, [args]) for a well-formed call of a registered action; raises ActionError otherwise."""
+        match = ACTION_GRAMMAR.fullmatch(text)
+        if not match:
+            raise ActionError(text, "expected name(\"argument\", ...)", f"Available actions: {self.signatures()}")
+        name, raw_args = match.group("name"), match.group("args") or ""
+        action = self.actions.get(name)
+        if action is None:
+            raise ActionError(text, f"unknown action '{name}'", f"Available actions: {self.signatures()}")
+
+        args = []
+        position = 0
+        while raw_args[position:].strip():
+            argument = ARGUMENT.match(raw_args, position)
+            if not argument:
+                raise ActionError(text, f"argument {len(args) + 1} of {name}() must be a quoted string",
+                                  f"Use: {action.signature}")
+            value = argument.group("double") if argument.group("double") is not None else argument.group("single")
+            args.append(ESCAPE.sub(r"\1", value))
+            position = argument.end()
+
+        if len(args) != len(action.params):
+            raise ActionError(text, f"{name}() takes {len(action.params)} argument(s), got {len(args)}",
+                              f"Use: {action.signature}")
+        return name, args
+
+    def run(self, name: str, args: list, context: dict) -> str:
+        """
+        Observation of a parsed action: the handler's result, or an error / timeout message.
+        Waits in the calling thread; coroutines use run_async().
+        """
+        action = self.actions[name]
+        if action.handler is None:
+            return f"✋ {name}() is handled by the agent loop."
+        if not action.timeout_s:
+            return _call(action, args, context)
+
+        # A daemon thread, so a handler that never returns can't keep the process alive
+        result = []
+        worker = threading.Thread(target=lambda: result.append(_call(action, args, context)), daemon=True)
+        worker.start()
+        worker.join(action.timeout_s)
+        if not result:
+            return _timed_out(action)
+        return result[0]
+
+    async def run_async(self, name: str, args: list, context: dict) -> str:
+        """run() for coroutines: the handler runs in a worker thread and only this coroutine awaits its timeout."""
+        action = self.actions[name]
+        if action.handler is None:
+            return f"✋ {name}() is handled by the agent loop."
+        # A daemon thread rather than asyncio.to_thread: a hung handler would hold an executor worker,
+        # and asyncio.run() waits for those at exit
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def work():
+            result = _call(action, args, context)
+            try:
+                loop.call_soon_threadsafe(lambda: future.done() or future.set_result(result))
+            except RuntimeError:
+                pass  # the loop is gone (the session timed out long ago)
+
+        threading.Thread(target=work, daemon=True).start()
+        try:
+            return await asyncio.wait_for(future, action.timeout_s or None)
+        except asyncio.TimeoutError:
+            return _timed_out(action)
+
+    def execute(self, text: str, context: dict) -> str:
+        """parse() + run(): the observation for an Action line, including validation errors."""
+        try:
+            name, args = self.parse(text)
+        except ActionError as e:
+            return str(e)
+        return self.run(name, args, context)
+
+
+def _timed_out(action: Action) -> str:
+    return f"⏱️ {action.name}() timed out after {action.timeout_s:g}s."
+
+
+def _call(action: Action, args: list, context: dict) -> str:
+    try:
+        return str(action.handler(context, *args))
+    except Exception as e:
+        return f"❌ {action.name}() failed: {type(e).__name__}: {e}"
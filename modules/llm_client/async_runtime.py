@@ -0,0 +1,96 @@
+"""
+Asyncio runtime for agent sessions: many sessions on one event loop.
+
+Agent loops spend most of their time waiting for the LLM. Run as coroutines, hundreds of
+sessions share one thread: while one waits on the network, the others make progress.
+- a global limit on in-flight LLM requests (MAX_CONCURRENT_REQUESTS), shared by all
+  sessions, so a burst of sessions can't exceed the provider's rate limits
+- a limit on sessions running at once (MAX_ACTIVE_SESSIONS, default: the request
+  limit); later sessions wait for a slot before they start. Without it, a burst larger
+  than the request limit advances every session in lockstep (the semaphore is FIFO),
+  so all of them finish late instead of most of them finishing on time
+- a timeout per session (SESSION_TIMEOUT_S, counted from when it starts running); a
+  session that runs out is cancelled and reported with status "timeout", without
+  affecting the others
+"""
+
+import asyncio
+import os
+import time
+
+import openai
+
+from modules.llm_client.cache import cached_completion, lookup, store
+from modules.llm_client.cassette import active_cassette, wrap_client
+from modules.token_counter.usage import usage_tracker
+
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "64"))
+MAX_ACTIVE_SESSIONS = int(os.getenv("MAX_ACTIVE_SESSIONS", "0"))  # 0 = same as MAX_CONCURRENT_REQUESTS
+SESSION_TIMEOUT_S = float(os.getenv("SESSION_TIMEOUT_S", "300"))
+
+TIMEOUT = "timeout"
+ERROR = "error"
+
+
+class AgentRuntime:
+    def __init__(self, client=None, max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+                 max_sessions: int = MAX_ACTIVE_SESSIONS, session_timeout: float = SESSION_TIMEOUT_S):
+        # The async client reads OPENAI_API_KEY / OPENAI_BASE_URL like the sync one (no key needed to replay a cassette)
+        replaying = active_cassette is not None and active_cassette.mode == "replay"
+        client = client or openai.AsyncOpenAI(api_key=openai.api_key or ("replay" if replaying else None),
+                                              base_url=openai.base_url)
+        self.client = wrap_client(client, is_async=True)
+        self.max_concurrency = max_concurrency
+        self.session_timeout = session_timeout
+        self.max_sessions = max_sessions or max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.session_slots = asyncio.Semaphore(self.max_sessions)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.completed_calls = 0
+
+    async def chat(self, messages: list, model: str, stage: str = "chat", **params):
+        """
+        One chat completion, waiting for a free slot under the global limit (cache hits
+        with LLM_CACHE=1 skip both). Usage is recorded under `stage`.
+        """
+        request = dict(model=model, messages=messages, **params)
+        key, cached = lookup(request)
+        if cached is not None:
+            response = cached_completion(cached)
+        else:
+            async with self.semaphore:
+                self.in_flight += 1
+                self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+                try:
+                    response = await self.client.chat.completions.create(**request)
+                finally:
+                    self.in_flight -= 1
+            self.completed_calls += 1
+            store(key, response.model_dump(mode="json"))
+        usage_tracker.record(stage, model, response, messages=messages)
+        return response
+
+    async def run_session(self, session, timeout: float = None) -> dict:
+        """
+        Awaits one session coroutine (which returns a dict) once a session slot is free,
+        under the per-session timeout. Adds "queued_s" and "elapsed_s" (running time);
+        a timed-out or failed session gets status "timeout" / "error" instead of raising,
+        so one bad session never stops the rest.
+        """
+        queued = time.perf_counter()
+        async with self.session_slots:
+            start = time.perf_counter()
+            try:
+                result = await asyncio.wait_for(session, timeout or self.session_timeout)
+            except asyncio.TimeoutError:
+                result = {"status": TIMEOUT}
+            except Exception as e:
+                result = {"status": ERROR, "error": f"{type(e).__name__}: {e}"}
+        result["queued_s"] = start - queued
+        result["elapsed_s"] = time.perf_counter() - start
+        return result
+
+    async def run_all(self, sessions: list, timeout: float = None) -> list:
+        """Runs session coroutines concurrently; returns their results in order."""
+        return await asyncio.gather(*(self.run_session(session, timeout) for session in sessions))
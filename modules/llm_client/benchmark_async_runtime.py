@@ -0,0 +1,105 @@
+"""
+Benchmark: sequential (sync) ReAct sessions vs many sessions on the asyncio runtime.
+
+Each session is the log_fixflow ReAct agent analysing the example log for `--steps`
+turns against a local mock chat-completions server (fixed latency + jitter per call).
+Reports, per mode:
+- finished sessions/s and completed LLM calls/s
+- median and p95 session latency from submission (queueing for a session slot included)
+- peak in-flight requests (bounded by the runtime's concurrency limit)
+- session outcomes (finished / timeout / error)
+
+The sync baseline runs fewer sessions (--sync-sessions), since it takes
+sessions x steps x latency seconds.
+
+Run from the repository root:
+    python -m modules.llm_client.benchmark_async_runtime --sessions 500 --steps 3 --latency 0.3 --concurrency 16 64 256
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import tempfile
+import time
+from collections import Counter
+
+import openai
+
+from modules.llm_client.async_runtime import AgentRuntime
+from modules.llm_client.mock_server import start_mock_server
+from modules.llm_client.sessions import SessionStore
+from modules.log_fixflow_react_agent import logic as agent
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(label: str, latencies: list, seconds: float, calls: int, outcomes: Counter, peak: int):
+    print(f"• {label:<22} {outcomes['finished'] / seconds:8.1f} sessions/s | {calls / seconds:8.1f} calls/s | "
+          f"p50 {statistics.median(latencies):.2f}s p95 {percentile(latencies, 0.95):.2f}s | "
+          f"peak in flight {peak:>4} | {dict(outcomes)}")
+
+
+def run_sync(count: int, store: SessionStore) -> tuple:
+    latencies = []
+    outcomes = Counter()
+    start = time.perf_counter()
+    for _ in range(count):
+        session_start = time.perf_counter()
+        result = agent.start_session(agent.log_example, store=store)
+        latencies.append(time.perf_counter() - session_start)
+        outcomes[result["status"]] += 1
+    return latencies, time.perf_counter() - start, outcomes
+
+
+async def run_async(count: int, store: SessionStore, base_url: str, concurrency: int, timeout: float) -> tuple:
+    client = openai.AsyncOpenAI(base_url=base_url, api_key="mock", max_retries=0)
+    runtime = AgentRuntime(client=client, max_concurrency=concurrency, session_timeout=timeout)
+    start = time.perf_counter()
+    results = await runtime.run_all([agent.start_session_async(agent.log_example, runtime, store) for _ in range(count)])
+    seconds = time.perf_counter() - start
+    await client.close()
+    return [r["queued_s"] + r["elapsed_s"] for r in results], seconds, Counter(r["status"] for r in results), runtime
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=500, help="Sessions per async run")
+    parser.add_argument("--sync-sessions", type=int, default=10, help="Sessions for the sequential baseline")
+    parser.add_argument("--steps", type=int, default=3, help="LLM calls per session")
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the mock answers")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Extra random latency (0..jitter seconds)")
+    parser.add_argument("--tokens-per-second", type=float, default=2000.0)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64, 256], help="Global request limits to compare")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-session timeout (s)")
+    parser.add_argument("--model", default="gpt-4o", help="Model name sent to the mock (and used for token counts)")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, jitter=args.jitter,
+                                         tokens_per_second=args.tokens_per_second, trailing_tokens=0, steps=args.steps)
+    openai.base_url, openai.api_key = base_url, "mock"
+    agent.MODEL = args.model
+    agent.STREAM_RESPONSES = False
+    store = SessionStore(tempfile.mkdtemp(prefix="sessions_"))
+    print(f"📊 {args.steps} calls per session | latency {args.latency}s + 0..{args.jitter}s | sessions saved in {store.path}")
+
+    with contextlib.redirect_stdout(io.StringIO()):  # the agent prints every step
+        latencies, seconds, outcomes = run_sync(args.sync_sessions, store)
+    report(f"sync x{args.sync_sessions}", latencies, seconds, args.sync_sessions * args.steps, outcomes, 1)
+
+    for concurrency in args.concurrency:
+        with contextlib.redirect_stdout(io.StringIO()):
+            latencies, seconds, outcomes, runtime = asyncio.run(
+                run_async(args.sessions, store, base_url, concurrency, args.timeout)
+            )
+        report(f"async x{args.sessions} limit {concurrency}", latencies, seconds, runtime.completed_calls, outcomes,
+               runtime.peak_in_flight)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark: full completions vs streaming with early termination at the closing tag.
+
+Runs ReAct-style steps against a local mock chat-completions server that writes a
+<start> ... <end> block followed by trailing text, and reports per step:
+- time to first token (streaming)
+- total latency of a plain completion vs a stream cancelled at <end>
+- the latency saved
+
+Run from the repository root:
+    python -m modules.llm_client.benchmark_streaming --steps 10 --latency 0.3 --trailing-tokens 100
+"""
+
+import argparse
+import statistics
+import time
+
+import openai
+
+from modules.llm_client.logic import stream_chat_until
+from modules.llm_client.mock_server import start_mock_server
+
+MESSAGES = [{"role": "user", "content": "Analyze the log and answer in <start> ... <end> format."}]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--trailing-tokens", type=int, default=100, help="Tokens the mock writes after <end>")
+    parser.add_argument("--model", default="gpt-4o", help="Model name sent to the mock (and used for token counts)")
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(latency=args.latency, tokens_per_second=args.tokens_per_second,
+                                         trailing_tokens=args.trailing_tokens)
+    client = openai.OpenAI(base_url=base_url, api_key="mock", max_retries=0)
+    print(f"📊 {args.steps} steps | first token after {args.latency}s | {args.tokens_per_second:.0f} tokens/s | "
+          f"{args.trailing_tokens} tokens after <end>")
+
+    full, streamed, ttfts = [], [], []
+    for step in range(args.steps):
+        start = time.perf_counter()
+        client.chat.completions.create(model=args.model, messages=MESSAGES, temperature=0)
+        full.append(time.perf_counter() - start)
+
+        result = stream_chat_until(MESSAGES, args.model, stage="benchmark", client=client, temperature=0)
+        assert result["stopped_early"] and result["text"].endswith("<end>")
+        streamed.append(result["total_s"])
+        ttfts.append(result["ttft_s"])
+        print(f"• step {step + 1:>2}: ttft {ttfts[-1]:.3f}s | full {full[-1]:.3f}s | "
+              f"streamed {streamed[-1]:.3f}s | saved {full[-1] - streamed[-1]:.3f}s")
+
+    print(f"⚡ mean per step: ttft {statistics.mean(ttfts):.3f}s, full {statistics.mean(full):.3f}s, "
+          f"streamed {statistics.mean(streamed):.3f}s, saved {statistics.mean(full) - statistics.mean(streamed):.3f}s "
+          f"({1 - statistics.mean(streamed) / statistics.mean(full):.0%})")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
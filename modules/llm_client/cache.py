@@ -0,0 +1,194 @@
+"""
+Opt-in disk cache for deterministic (temperature=0) chat completions.
+
+Reruns of a pipeline over the same errors send byte-identical requests; with
+LLM_CACHE=1 they are answered from a local SQLite file instead of the network.
+- key:      SHA-256 of the canonical JSON of the request (model, messages, tools, params)
+- eviction: least recently used entries go first once the file holds more than LLM_CACHE_MAX_MB
+- expiry:   entries older than LLM_CACHE_TTL_S are ignored and removed
+- stats:    hits / misses / evictions, kept in the file, so they add up across processes
+
+SQLite does the locking (WAL mode, one short transaction per read or write), so any
+number of processes and threads can share one cache file.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import openai
+from openai.types.chat import ChatCompletion
+
+from modules.llm_client.cassette import cassette_active, wrap_client
+
+LLM_CACHE = os.getenv("LLM_CACHE", "0") == "1"
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./.llm_cache/responses.sqlite3")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed);
+CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+def _jsonable(value):
+    # SDK objects in a request (e.g. tool_calls echoed back in an assistant message)
+    if hasattr(value, "model_dump"):
+        return value.model_dump(mode="json", exclude_none=True)
+    raise TypeError(f"❌ Can't hash {type(value).__name__} in a cache key")
+
+
+def cache_key(request: dict) -> str:
+    """Stable hash of a request: same model, messages, tools and params -> same key."""
+    canonical = json.dumps(request, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=_jsonable)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def is_cacheable(request: dict) -> bool:
+    """Only deterministic, single-choice requests: temperature 0 and n of 1."""
+    return request.get("temperature") == 0 and request.get("n", 1) == 1
+
+
+class ResponseCache:
+    def __init__(self, path=LLM_CACHE_PATH, max_mb: float = LLM_CACHE_MAX_MB, ttl_s: float = LLM_CACHE_TTL_S):
+        self.path = Path(path)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl_s = ttl_s
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")  # readers never block the writer
+            db.executescript(_SCHEMA)
+        finally:
+            db.close()
+
+    def _connect(self):
+        # One connection per operation: safe across threads, and cheap next to an LLM call
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute("PRAGMA busy_timeout=30000")
+        return _Transaction(db)
+
+    @staticmethod
+    def _count(db, name: str, amount: int = 1):
+        db.execute("INSERT INTO stats VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + ?",
+                   (name, amount, amount))
+
+    def get(self, key: str):
+        """The stored value (a dict) or None. A hit refreshes the entry's LRU position."""
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_s:
+                db.execute("DELETE FROM entries WHERE key = ?", (key,))
+                row = None
+            if row is None:
+                self._count(db, "misses")
+                return None
+            db.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._count(db, "hits")
+        return json.loads(row[0])
+
+    def put(self, key: str, value: dict):
+        """Stores a value, then evicts least recently used entries until the cache fits."""
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", (key, data, len(data), now, now))
+            total = db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            evicted = 0
+            for old_key, size in db.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+                if total <= self.max_bytes:
+                    break
+                db.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                total -= size
+                evicted += 1
+            self._count(db, "evictions", evicted)
+
+    def stats(self) -> dict:
+        """Entries, size and hit/miss/eviction counts of all processes using this file."""
+        with self._connect() as db:
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+            counts = dict(db.execute("SELECT name, value FROM stats").fetchall())
+        hits, misses = counts.get("hits", 0), counts.get("misses", 0)
+        return {
+            "entries": entries,
+            "size_mb": round(size / 1024 / 1024, 3),
+            "hits": hits,
+            "misses": misses,
+            "evictions": counts.get("evictions", 0),
+            "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+        }
+
+    def clear(self):
+        with self._connect() as db:
+            db.execute("DELETE FROM entries")
+            db.execute("DELETE FROM stats")
+
+
+class _Transaction:
+    """`with` block = one write transaction (BEGIN IMMEDIATE ... COMMIT), then the connection is closed."""
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        self.db.execute("BEGIN IMMEDIATE")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        self.db.close()
+
+
+# Shared cache used by all call sites when LLM_CACHE=1 (off with a cassette, so replays follow the recording)
+if LLM_CACHE and cassette_active():
+    print("📼 Cassette active: response cache disabled")
+response_cache = ResponseCache() if LLM_CACHE and not cassette_active() else None
+
+
+def lookup(request: dict, cache: ResponseCache = None):
+    """(key, cached value or None); key is None when the request must not be cached."""
+    cache = cache or response_cache
+    if cache is None or not is_cacheable(request):
+        return None, None
+    key = cache_key(request)
+    return key, cache.get(key)
+
+
+def store(key: str, value: dict, cache: ResponseCache = None):
+    """Saves a value under a key from lookup() (no-op for uncacheable requests)."""
+    if key is not None:
+        (cache or response_cache).put(key, value)
+
+
+def cached_completion(value: dict) -> ChatCompletion:
+    response = ChatCompletion.model_validate(value)
+    response.from_cache = True  # usage_tracker records it as free
+    return response
+
+
+def cached_chat_completion(client=None, cache: ResponseCache = None, **request):
+    """
+    chat.completions.create(**request) through the response cache (when enabled and the
+    request is deterministic). Returns a ChatCompletion either way.
+    """
+    client = wrap_client(client or openai)
+    key, value = lookup(request, cache)
+    if value is not None:
+        return cached_completion(value)
+    response = client.chat.completions.create(**request)
+    store(key, response.model_dump(mode="json"), cache)
+    return response
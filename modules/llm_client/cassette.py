@@ -0,0 +1,285 @@
+"""
+Record / replay of OpenAI calls ("cassettes") for offline, deterministic runs.
+
+    LLM_CASSETTE=cassettes/v1.jsonl LLM_CASSETTE_MODE=record  -> real calls, every request and response appended
+    LLM_CASSETTE=cassettes/v1.jsonl LLM_CASSETTE_MODE=replay  -> no network: responses served from the file
+
+Covers chat completions (plain and streamed, incl. tool calls and usage) and embeddings,
+at the places the project calls the SDK: cached_chat_completion, stream_chat_until,
+AgentRuntime.chat and embed_texts. A cassette is JSON Lines, one interaction per line.
+
+Replay matches requests by a hash of (kind, request); identical requests are answered in
+recorded order, and the last answer repeats once they run out. An unknown request raises
+CassetteMiss. LLM_CASSETTE_LATENCY simulates the network:
+    none                    no delay (measures local overhead only; default)
+    recorded                the latency measured while recording (per chunk for streams)
+    fixed:0.3               0.3 s per call
+    normal:0.5,0.1          mean, standard deviation (s)
+    lognormal:0.5,0.4       median (s), sigma
+Sampling is seeded (LLM_CASSETTE_SEED), so replays are repeatable.
+
+While a cassette is active (record or replay), the response cache (LLM_CACHE) and the
+known-fix store (KNOWN_FIXES) are off: a hit in either skips the LLM call, so a replay
+could take another path than the recording did, or ask for calls that were never recorded.
+"""
+
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import defaultdict, deque
+from pathlib import Path
+
+from openai.types import CreateEmbeddingResponse
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+LLM_CASSETTE = os.getenv("LLM_CASSETTE")
+LLM_CASSETTE_MODE = os.getenv("LLM_CASSETTE_MODE", "replay")
+LLM_CASSETTE_LATENCY = os.getenv("LLM_CASSETTE_LATENCY", "none")
+LLM_CASSETTE_SEED = int(os.getenv("LLM_CASSETTE_SEED", "0"))
+
+MODES = ("record", "replay")
+LATENCY_MODELS = ("none", "recorded", "fixed", "normal", "lognormal")
+
+RESPONSE_TYPES = {"chat": ChatCompletion, "embedding": CreateEmbeddingResponse}
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode for a request that is not on the cassette."""
+
+
+def _dump(request: dict) -> dict:
+    return json.loads(json.dumps(request, default=lambda value: value.model_dump(mode="json", exclude_none=True)))
+
+
+class LatencyModel:
+    def __init__(self, spec: str = LLM_CASSETTE_LATENCY, seed: int = LLM_CASSETTE_SEED):
+        name, _, args = spec.partition(":")
+        if name not in LATENCY_MODELS:
+            raise ValueError(f"❌ Unknown latency model '{spec}' (expected one of {LATENCY_MODELS})")
+        self.name = name
+        self.args = [float(value) for value in args.split(",")] if args else []
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+
+    def sample(self, recorded: float) -> float:
+        """Seconds to wait before a response (recorded = what the live call took)."""
+        with self.lock:
+            if self.name == "none":
+                return 0.0
+            if self.name == "recorded":
+                return recorded
+            if self.name == "fixed":
+                return self.args[0]
+            if self.name == "normal":
+                return max(0.0, self.random.gauss(*self.args))
+            return self.args[0] * math.exp(self.random.gauss(0.0, self.args[1]))
+
+
+class Cassette:
+    def __init__(self, path, mode: str = LLM_CASSETTE_MODE, latency: str = LLM_CASSETTE_LATENCY,
+                 seed: int = LLM_CASSETTE_SEED):
+        if mode not in MODES:
+            raise ValueError(f"❌ Unknown cassette mode '{mode}' (expected one of {MODES})")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = LatencyModel(latency, seed)
+        self.lock = threading.Lock()
+        self.interactions = defaultdict(deque)
+        self.replayed = 0
+        self.recording = False  # the file is only replaced once the first call is recorded
+
+        if mode == "replay":
+            with self.path.open(encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        self.interactions[entry["key"]].append(entry)
+
+    @staticmethod
+    def key(kind: str, request: dict) -> str:
+        canonical = json.dumps(dict(_dump(request), _kind=kind), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def record(self, kind: str, request: dict, entry: dict):
+        entry = dict(entry, kind=kind, key=self.key(kind, request), request=_dump(request))
+        line = json.dumps(entry, ensure_ascii=False)
+        with self.lock:
+            if not self.recording:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self.path.write_text("", encoding="utf-8")  # a recording starts a new cassette
+                self.recording = True
+            with self.path.open("a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def next(self, kind: str, request: dict) -> dict:
+        """The recorded interaction for a request (in recorded order, repeating the last one)."""
+        key = self.key(kind, request)
+        with self.lock:
+            queue = self.interactions.get(key)
+            if not queue:
+                raise CassetteMiss(f"❌ {kind} request not on cassette {self.path} "
+                                   f"(model {request.get('model')}); record it again with LLM_CASSETTE_MODE=record")
+            entry = queue.popleft() if len(queue) > 1 else queue[0]
+            self.replayed += 1
+        return entry
+
+    def delays(self, entry: dict) -> list:
+        """Wait before each streamed chunk: the recorded pacing, or the sampled latency before the first one."""
+        offsets = [offset for offset, _ in entry["chunks"]]
+        if self.latency.name == "recorded":
+            return [later - earlier for earlier, later in zip([0.0] + offsets, offsets)]
+        return [self.latency.sample(entry["latency_s"])] + [0.0] * (len(offsets) - 1)
+
+
+# ================================
+# Client wrappers
+# ================================
+
+class _RecordingStream:
+    """Passes chunks through and records them with their arrival times when the stream ends."""
+
+    def __init__(self, stream, cassette: Cassette, request: dict, start: float):
+        self.stream, self.cassette, self.request, self.start = stream, cassette, request, start
+        self.chunks = []
+        self.saved = False
+
+    def __iter__(self):
+        for chunk in self.stream:
+            self.chunks.append((time.perf_counter() - self.start, chunk.model_dump(mode="json")))
+            yield chunk
+        self._save()
+
+    def close(self):
+        self.stream.close()
+        self._save()
+
+    def _save(self):
+        if not self.saved:
+            self.saved = True
+            latency = self.chunks[0][0] if self.chunks else time.perf_counter() - self.start
+            self.cassette.record("chat_stream", self.request, {"chunks": self.chunks, "latency_s": latency})
+
+
+class _AsyncRecordingStream(_RecordingStream):
+    """_RecordingStream for the async client (async for / await close())."""
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            self.chunks.append((time.perf_counter() - self.start, chunk.model_dump(mode="json")))
+            yield chunk
+        self._save()
+
+    async def close(self):
+        await self.stream.close()
+        self._save()
+
+
+class _ReplayStream:
+    def __init__(self, entry: dict, delays: list):
+        self.entry, self.delays = entry, delays
+
+    def __iter__(self):
+        for delay, (_, chunk) in zip(self.delays, self.entry["chunks"]):
+            if delay:
+                time.sleep(delay)
+            yield ChatCompletionChunk.model_validate(chunk)
+
+    async def __aiter__(self):
+        for delay, (_, chunk) in zip(self.delays, self.entry["chunks"]):
+            if delay:
+                await asyncio.sleep(delay)
+            yield ChatCompletionChunk.model_validate(chunk)
+
+    def close(self):
+        pass
+
+
+class _AsyncReplayStream(_ReplayStream):
+    async def close(self):
+        pass
+
+
+class _Endpoint:
+    def __init__(self, cassette: Cassette, kind: str, create, is_async: bool = False):
+        self.cassette, self.kind, self.real_create, self.is_async = cassette, kind, create, is_async
+
+    def _replay(self, request: dict):
+        kind = "chat_stream" if request.get("stream") else self.kind
+        entry = self.cassette.next(kind, request)
+        if kind == "chat_stream":
+            return _ReplayStream(entry, self.cassette.delays(entry)), 0.0
+        response = RESPONSE_TYPES[kind].model_validate(entry["response"])
+        return response, self.cassette.latency.sample(entry["latency_s"])
+
+    def create(self, **request):
+        if self.is_async:
+            return self._create_async(**request)
+        if self.cassette.mode == "replay":
+            response, delay = self._replay(request)
+            if delay:
+                time.sleep(delay)
+            return response
+
+        start = time.perf_counter()
+        response = self.real_create(**request)
+        if request.get("stream"):
+            return _RecordingStream(response, self.cassette, request, start)
+        self.cassette.record(self.kind, request, {"response": response.model_dump(mode="json"),
+                                                  "latency_s": time.perf_counter() - start})
+        return response
+
+    async def _create_async(self, **request):
+        if self.cassette.mode == "replay":
+            response, delay = self._replay(request)
+            if request.get("stream"):
+                return _AsyncReplayStream(response.entry, response.delays)
+            if delay:
+                await asyncio.sleep(delay)
+            return response
+
+        start = time.perf_counter()
+        response = await self.real_create(**request)
+        if request.get("stream"):
+            return _AsyncRecordingStream(response, self.cassette, request, start)
+        self.cassette.record(self.kind, request, {"response": response.model_dump(mode="json"),
+                                                  "latency_s": time.perf_counter() - start})
+        return response
+
+
+class _Namespace:
+    pass
+
+
+class CassetteClient:
+    """Stands in for an OpenAI client (or the openai module): chat.completions.create and embeddings.create."""
+
+    def __init__(self, client, cassette: Cassette, is_async: bool = False):
+        self.client = client
+        self.chat = _Namespace()
+        self.chat.completions = _Endpoint(cassette, "chat", lambda **r: client.chat.completions.create(**r), is_async)
+        self.embeddings = _Endpoint(cassette, "embedding", lambda **r: client.embeddings.create(**r), is_async)
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+# Cassette used by all call sites when LLM_CASSETTE is set
+active_cassette = Cassette(LLM_CASSETTE) if LLM_CASSETTE else None
+
+
+def cassette_active() -> bool:
+    """True while recording or replaying: stores that skip LLM calls must stay off."""
+    return active_cassette is not None
+
+
+def wrap_client(client, is_async: bool = False, cassette: Cassette = None):
+    """`client` routed through the active cassette (unchanged when there is none)."""
+    cassette = cassette or active_cassette
+    if cassette is None or isinstance(client, CassetteClient):
+        return client
+    return CassetteClient(client, cassette, is_async)
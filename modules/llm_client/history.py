@@ -0,0 +1,207 @@
+"""
+Token-budgeted conversation history for long ReAct sessions.
+
+- Tool outputs longer than INLINE_OUTPUT_TOKENS are kept once in an OutputStore; the
+  conversation only carries a reference (handle, size, short preview) and the agent can
+  bring an output back with read_output("<handle>"). Outputs already in the prompt
+  (e.g. the log itself) are referenced without a preview.
+- When the conversation exceeds HISTORY_MAX_TOKENS, the observations of the oldest steps
+  are compacted into a reference plus a short summary, oldest first, until it fits.
+  The prefix (system prompt + input) and the most recent steps are never compacted.
+  Summaries are deterministic by default (pack_context keeps the error lines);
+  HISTORY_SUMMARIZER=llm asks the model instead, once per output.
+"""
+
+import hashlib
+import os
+
+from modules.llm_client.cache import cached_chat_completion
+from modules.token_counter.context_packing import pack_context
+from modules.token_counter.logic import count_tokens
+from modules.token_counter.usage import usage_tracker
+
+# Conversation budget in tokens (0 = never compact)
+HISTORY_MAX_TOKENS = int(os.getenv("HISTORY_MAX_TOKENS", "8000"))
+# Outputs up to this size are shown inline, larger ones are stored and referenced
+INLINE_OUTPUT_TOKENS = int(os.getenv("INLINE_OUTPUT_TOKENS", "300"))
+# "truncate" (deterministic, no extra calls) or "llm"
+HISTORY_SUMMARIZER = os.getenv("HISTORY_SUMMARIZER", "truncate")
+SUMMARIZERS = ("truncate", "llm")
+
+SUMMARY_TOKENS = 60       # size of a preview / compacted observation
+KEEP_RECENT_STEPS = 2     # the latest steps always keep their full observation
+MESSAGE_OVERHEAD_TOKENS = 4  # role and separators the API adds per message
+
+REFERENCE = '[output {handle}: {tokens} tokens, {lines} lines – read_output("{handle}") shows it in full]'
+SEEN_REFERENCE = "[output {handle}: identical to the {name} above]"
+
+SUMMARY_PROMPT = (
+    "Summarize this tool output for a log analysis agent in at most {max_tokens} tokens. "
+    "Keep error messages, exception names, file names and line numbers verbatim."
+)
+
+
+class OutputStore:
+    """Keeps each tool output once, addressed by a short content hash."""
+
+    def __init__(self):
+        self.outputs = {}
+        self.summaries = {}
+
+    def put(self, text: str) -> str:
+        handle = "out-" + hashlib.sha1(text.encode("utf-8")).hexdigest()[:8]
+        self.outputs.setdefault(handle, text)
+        return handle
+
+    def get(self, handle: str) -> str:
+        if handle not in self.outputs:
+            raise KeyError(f"❌ Unknown output handle '{handle}'")
+        return self.outputs[handle]
+
+
+def summarize_with_llm(text: str, max_tokens: int, model: str) -> str:
+    messages = [
+        {"role": "system", "content": SUMMARY_PROMPT.format(max_tokens=max_tokens)},
+        {"role": "user", "content": text},
+    ]
+    response = cached_chat_completion(model=model, messages=messages, temperature=0, max_tokens=max_tokens)
+    usage_tracker.record("history_summary", model, response, messages=messages)
+    return response.choices[0].message.content.strip()
+
+
+class ReActHistory:
+    """
+    The message list sent to the model: `prefix` messages plus the rendered messages of each step.
+
+    add(step) stores a large observation by handle, renders the step once (with `render`,
+    the agent's step -> list of messages function, e.g. the assistant's action followed by
+    the observation as a user message) and compacts the oldest observations when the total
+    goes over `max_tokens`. Token counts are kept per message, so a step costs one count
+    per message when added and again per compaction.
+    """
+
+    def __init__(self, prefix: list, render, model: str, max_tokens: int = HISTORY_MAX_TOKENS,
+                 inline_tokens: int = INLINE_OUTPUT_TOKENS, summarizer: str = HISTORY_SUMMARIZER,
+                 keep_recent: int = KEEP_RECENT_STEPS, seen: dict = None):
+        if summarizer not in SUMMARIZERS:
+            raise ValueError(f"❌ Unknown summarizer '{summarizer}' (expected one of {SUMMARIZERS})")
+        self.render = render
+        self.model = model
+        self.max_tokens = max_tokens
+        self.inline_tokens = inline_tokens
+        self.summarizer = summarizer
+        self.keep_recent = keep_recent
+        self.store = OutputStore()
+
+        # Texts already in the prefix (e.g. {"log": log_text}) are never repeated
+        self.seen = {self.store.put(text): name for name, text in (seen or {}).items()}
+
+        self.messages = list(prefix)
+        self.tokens = [self._count(message) for message in self.messages]
+        self.prefix_length = len(self.messages)
+        self.steps = []       # (step as shown, full observation)
+        self.positions = []   # index in self.messages of each step's first message
+        self.compacted = 0    # the oldest steps whose observation is already compacted
+
+    def _count(self, message: dict) -> int:
+        return count_tokens(message["content"], model=self.model) + MESSAGE_OVERHEAD_TOKENS
+
+    def total_tokens(self) -> int:
+        return sum(self.tokens)
+
+    def _summary(self, handle: str) -> str:
+        if handle not in self.store.summaries:
+            text = self.store.get(handle)
+            if self.summarizer == "llm":
+                summary = summarize_with_llm(text, SUMMARY_TOKENS, self.model)
+            else:
+                summary = pack_context(text, SUMMARY_TOKENS, model=self.model)
+            self.store.summaries[handle] = summary
+        return self.store.summaries[handle]
+
+    def _reference(self, text: str) -> str:
+        handle = self.store.put(text)
+        if handle in self.seen:
+            return SEEN_REFERENCE.format(handle=handle, name=self.seen[handle])
+        reference = REFERENCE.format(handle=handle, tokens=count_tokens(text, model=self.model),
+                                     lines=text.count("\n") + 1)
+        return f"{reference}\n{self._summary(handle)}"
+
+    def observe(self, output: str) -> str:
+        """What the conversation shows for a tool output: inline if short, else a reference."""
+        if self.store.put(output) not in self.seen and count_tokens(output, model=self.model) <= self.inline_tokens:
+            return output
+        return self._reference(output)
+
+    def _render(self, step: dict) -> list:
+        messages = self.render(step)
+        return [messages] if isinstance(messages, dict) else list(messages)
+
+    def add(self, step: dict, inline: bool = False) -> list:
+        """
+        Appends a completed step (thought/action/observation). The caller's dict is not
+        changed; inline=True shows the observation as is (e.g. the result of read_output).
+        Returns the messages that were appended.
+        """
+        observation = step["observation"]
+        shown = dict(step, observation=observation if inline else self.observe(observation))
+        messages = self._render(shown)
+        self.steps.append((shown, observation))
+        self.positions.append(len(self.messages))
+        self.messages += messages
+        self.tokens += [self._count(message) for message in messages]
+        self.compact()
+        return messages
+
+    def compact(self):
+        """Compacts the oldest observations until the conversation fits (or nothing is left to compact)."""
+        if not self.max_tokens:
+            return
+        total = self.total_tokens()
+        while total > self.max_tokens and self.compacted < len(self.steps) - self.keep_recent:
+            index = self.compacted
+            shown, observation = self.steps[index]
+            self.compacted += 1
+
+            compacted = dict(shown, observation=self._reference(observation))
+            messages = self._render(compacted)
+            tokens = [self._count(message) for message in messages]
+            position = self.positions[index]
+            span = slice(position, position + len(messages))
+            if sum(tokens) >= sum(self.tokens[span]):
+                continue  # already short: the reference would not save anything
+            self.steps[index] = (compacted, observation)
+            self.messages[span] = messages
+            total += sum(tokens) - sum(self.tokens[span])
+            self.tokens[span] = tokens
+
+    def to_dict(self) -> dict:
+        """JSON-serialisable state of the steps (the prefix is rebuilt by the caller on load)."""
+        return {
+            "steps": [[shown, observation] for shown, observation in self.steps],
+            "step_tokens": self.tokens[self.prefix_length:],
+            "compacted": self.compacted,
+            "outputs": self.store.outputs,
+            "summaries": self.store.summaries,
+            "seen": self.seen,
+        }
+
+    @classmethod
+    def from_dict(cls, state: dict, prefix: list, render, model: str, **options):
+        """Rebuilds a history saved with to_dict(); steps are re-rendered, not re-counted."""
+        history = cls(prefix, render, model, **options)
+        history.store.outputs.update(state["outputs"])
+        history.store.summaries.update(state["summaries"])
+        history.seen = dict(state["seen"])
+        history.steps = [(shown, observation) for shown, observation in state["steps"]]
+        for shown, _ in history.steps:
+            history.positions.append(len(history.messages))
+            history.messages += history._render(shown)
+        step_messages = history.messages[history.prefix_length:]
+        if len(state["step_tokens"]) == len(step_messages):
+            history.tokens += state["step_tokens"]
+        else:
+            # Saved with another rendering (messages per step): count again
+            history.tokens += [history._count(message) for message in step_messages]
+        history.compacted = state["compacted"]
+        return history
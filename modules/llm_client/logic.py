@@ -0,0 +1,84 @@
+import time
+from types import SimpleNamespace
+
+import openai
+
+from modules.llm_client.cache import lookup, store
+from modules.llm_client.cassette import wrap_client
+from modules.token_counter.usage import usage_tracker
+
+# Closing tags of the answer blocks our prompts ask for (ReAct blocks and JSON plans)
+DEFAULT_STOP_TAGS = ("<end>", "</end>")
+
+
+def stream_chat_until(messages: list, model: str, stop_tags=DEFAULT_STOP_TAGS, stage: str = "chat",
+                      client=None, **params) -> dict:
+    """
+    Streams a chat completion and cancels it as soon as one of `stop_tags` arrives,
+    instead of waiting for (and paying for) text the model writes after the block.
+
+    Returns a dict:
+    - "text":          the completion up to and including the stop tag
+    - "stopped_early": True if the stream was cancelled at a stop tag
+    - "ttft_s":        seconds to the first content token
+    - "total_s":       seconds until the text was complete
+    - "cached":        True if the text came from the response cache (LLM_CACHE=1)
+    Usage is recorded under `stage`; when the stream is cancelled the final usage
+    chunk never arrives, so tokens are counted locally instead.
+    """
+    client = wrap_client(client or openai)
+    start = time.perf_counter()
+
+    # The text depends on where the stream is cut, so the stop tags are part of the key
+    key, cached = lookup(dict(model=model, messages=messages, stop_tags=list(stop_tags), **params))
+    if cached is not None:
+        usage_tracker.record(stage, model, SimpleNamespace(from_cache=True), messages=messages)
+        elapsed = time.perf_counter() - start
+        return dict(cached, ttft_s=elapsed, total_s=elapsed, cached=True)
+    stream = client.chat.completions.create(
+        model=model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},
+        **params
+    )
+
+    text = ""
+    ttft = None
+    usage = None
+    stopped_early = False
+    longest_tag = max(len(tag) for tag in stop_tags)
+    try:
+        for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            if ttft is None:
+                ttft = time.perf_counter() - start
+
+            # Only the new text (plus a tag's length before it) can complete a tag
+            search_from = max(0, len(text) - longest_tag)
+            text += chunk.choices[0].delta.content
+            positions = [(text.find(tag, search_from), tag) for tag in stop_tags]
+            found = [(position, tag) for position, tag in positions if position != -1]
+            if found:
+                position, tag = min(found)
+                text = text[:position + len(tag)]
+                stopped_early = True
+                break
+    finally:
+        stream.close()  # closes the connection, which also stops generation server-side
+    total = time.perf_counter() - start
+
+    usage_tracker.record(stage, model, SimpleNamespace(usage=usage) if usage else None,
+                         messages=messages, completion=text)
+    if text:
+        store(key, {"text": text, "stopped_early": stopped_early})
+    return {
+        "text": text,
+        "stopped_early": stopped_early,
+        "ttft_s": ttft if ttft is not None else total,
+        "total_s": total,
+        "cached": False,
+    }
@@ -0,0 +1,120 @@
+"""
+Local mock of POST /v1/chat/completions for offline benchmarks.
+
+Answers every request with a ReAct block followed by trailing text (the chatter
+models often add after <end>), produced at a fixed token rate after an initial
+latency. With steps > 1, the first steps - 1 turns of a conversation (counted by its
+assistant messages) get an intermediate action instead of the final one.
+Supports plain and streamed (SSE) responses, including the final usage
+chunk when stream_options.include_usage is set.
+"""
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DEFAULT_REPLY = (
+    "<start>\n"
+    "Thought: The log shows the Groovy compiler failing on the Jenkinsfile.\n"
+    "Action: suggest_fix()\n"
+    "Observation: Fix the syntax error reported by ErrorCollector.\n"
+    "<end>"
+)
+INTERMEDIATE_REPLY = (
+    "<start>\n"
+    "Thought: I need to know whether this error is known.\n"
+    "Action: search_error(\"ErrorCollector.failIfErrors\")\n"
+    "Observation: pending\n"
+    "<end>"
+)
+TRAILING_TEXT = " Note: this analysis is based only on the log lines shown above and may need more context."
+
+
+def make_chat_handler(latency: float = 0.3, jitter: float = 0.0, tokens_per_second: float = 50.0,
+                      trailing_tokens: int = 100, reply: str = DEFAULT_REPLY, steps: int = 1):
+    trailing = (TRAILING_TEXT.split(" ") * (trailing_tokens // 16 + 1))[:trailing_tokens]
+
+    def split(text: str) -> list:
+        # One "token" per word, keeping the separators so the joined text is exact
+        words = text.split(" ") + trailing
+        return [word + " " for word in words[:-1]] + words[-1:]
+
+    final_pieces = split(reply)
+    intermediate_pieces = split(INTERMEDIATE_REPLY)
+
+    class MockChatHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            prompt_tokens = len(json.dumps(body["messages"])) // 4
+            turn = sum(message.get("role") == "assistant" for message in body["messages"])
+            pieces = intermediate_pieces if turn < steps - 1 else final_pieces
+            time.sleep(latency + random.uniform(0, jitter))
+
+            if body.get("stream"):
+                self.stream_reply(body, prompt_tokens, pieces)
+            else:
+                time.sleep(len(pieces) / tokens_per_second)
+                self.send_json(self.completion(body, prompt_tokens, pieces))
+
+        def completion(self, body, prompt_tokens, pieces):
+            return {
+                "id": "chatcmpl-mock",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body["model"],
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(pieces)},
+                    "finish_reason": "stop",
+                }],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                          "total_tokens": prompt_tokens + len(pieces)},
+            }
+
+        def stream_reply(self, body, prompt_tokens, pieces):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk",
+                    "created": int(time.time()), "model": body["model"]}
+            try:
+                for piece in pieces:
+                    chunk = dict(base, choices=[{"index": 0, "delta": {"content": piece}, "finish_reason": None}])
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(1 / tokens_per_second)
+                if body.get("stream_options", {}).get("include_usage"):
+                    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": len(pieces),
+                             "total_tokens": prompt_tokens + len(pieces)}
+                    self.wfile.write(f"data: {json.dumps(dict(base, choices=[], usage=usage))}\n\n".encode())
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client cancelled the stream
+
+        def send_json(self, payload: dict):
+            data = json.dumps(payload).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            try:
+                self.wfile.write(data)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client gave up (e.g. a session timeout)
+
+        def log_message(self, *args):
+            pass
+
+    return MockChatHandler
+
+
+def start_mock_server(**options):
+    """Starts the mock in a background thread. Returns (server, base_url for openai.OpenAI)."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_chat_handler(**options), bind_and_activate=False)
+    server.request_queue_size = 1024  # listen backlog: benchmarks open hundreds of connections at once
+    server.server_bind()
+    server.server_activate()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
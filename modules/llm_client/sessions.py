@@ -0,0 +1,106 @@
+"""
+File-backed store for paused agent sessions.
+
+A session waiting on ask_user is one JSON file (<session_id>.json) in SESSION_DIR and
+holds no thread, socket or memory in the service process, so any number of sessions can
+wait for answers and they survive restarts. Writes go to a temporary file that is then
+swapped in, so a crash never leaves half a session behind.
+
+claim() renames the file before a session resumes (an atomic rename on one filesystem):
+when two workers get an answer for the same session, only one of them continues it.
+
+Only waiting sessions stay in SESSION_DIR. A session that finishes or fails is deleted,
+or moved to SESSION_DIR/ended/ with SESSION_ARCHIVE=1, so the directory doesn't grow
+with every session ever run and waiting() is a directory listing.
+"""
+
+import json
+import os
+import uuid
+from pathlib import Path
+
+SESSION_DIR = os.getenv("SESSION_DIR", "./sessions")
+SESSION_ARCHIVE = os.getenv("SESSION_ARCHIVE", "0") == "1"
+
+WAITING = "waiting"
+FINISHED = "finished"
+FAILED = "failed"
+
+
+class SessionNotWaiting(KeyError):
+    """Raised when resuming a session that does not exist, has ended or is already being resumed."""
+
+
+class SessionStore:
+    def __init__(self, path=SESSION_DIR, archive: bool = SESSION_ARCHIVE):
+        self.path = Path(path)
+        self.archive = archive
+        self.ended_path = self.path / "ended"
+
+    def new_id(self) -> str:
+        return uuid.uuid4().hex
+
+    def _file(self, session_id: str, suffix: str = ".json") -> Path:
+        if not session_id.isalnum():
+            raise ValueError(f"❌ Invalid session id '{session_id}'")
+        return self.path / f"{session_id}{suffix}"
+
+    def save(self, state: dict):
+        """
+        Stores a waiting session (returns its file). An ended one is deleted, or
+        archived when the store archives (returns the archive file, else None).
+        """
+        session_id = state["session_id"]
+        if state["status"] == WAITING:
+            target = self._file(session_id)
+        elif self.archive:
+            target = self.ended_path / self._file(session_id).name
+        else:
+            target = None
+
+        if target is not None:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp_file = target.with_suffix(".tmp")
+            tmp_file.write_text(json.dumps(state), encoding="utf-8")
+            os.replace(tmp_file, target)
+        if state["status"] != WAITING:
+            self._file(session_id).unlink(missing_ok=True)
+        self._file(session_id, ".claimed").unlink(missing_ok=True)
+        return target
+
+    def load(self, session_id: str) -> dict:
+        """A waiting session, or an archived one that has ended."""
+        path = self._file(session_id)
+        if not path.exists():
+            path = self.ended_path / path.name
+        if not path.exists():
+            raise SessionNotWaiting(f"❌ No stored session '{session_id}'")
+        return json.loads(path.read_text(encoding="utf-8"))
+
+    def claim(self, session_id: str) -> dict:
+        """Takes a waiting session for resuming; its file is hidden until save() or release()."""
+        claimed = self._file(session_id, ".claimed")
+        try:
+            os.rename(self._file(session_id), claimed)
+        except FileNotFoundError:
+            raise SessionNotWaiting(f"❌ Session '{session_id}' is not waiting (unknown, finished or already resumed)")
+        state = json.loads(claimed.read_text(encoding="utf-8"))
+        if state["status"] != WAITING:
+            self.release(session_id)
+            raise SessionNotWaiting(f"❌ Session '{session_id}' is {state['status']}, not waiting")
+        return state
+
+    def release(self, session_id: str):
+        """Puts a claimed session back unchanged (e.g. when resuming it failed)."""
+        os.replace(self._file(session_id, ".claimed"), self._file(session_id))
+
+    def waiting(self) -> list:
+        """Ids of the sessions currently waiting for an answer (every *.json left in the directory)."""
+        if not self.path.exists():
+            return []
+        return [path.stem for path in self.path.glob("*.json")]
+
+    def delete(self, session_id: str):
+        self._file(session_id).unlink(missing_ok=True)
+        self._file(session_id, ".claimed").unlink(missing_ok=True)
+        (self.ended_path / self._file(session_id).name).unlink(missing_ok=True)
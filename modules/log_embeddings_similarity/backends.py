@@ -0,0 +1,168 @@
+import os
+import re
+import zlib
+
+import numpy as np
+import scipy.sparse as sp
+
+from modules.log_embeddings_similarity.embedding_pipeline import EMBEDDING_MODEL, embed_texts
+
+WORD_RE = re.compile(r"[a-z0-9_]+")
+
+# Upper bound for the feature -> bucket memo of the local backend
+MAX_CACHED_FEATURES = 1_000_000
+
+
+# ================================
+# Backend interface
+# ================================
+
+class EmbeddingBackend:
+    """
+    Base class for embedding backends used by the similarity index.
+
+    A backend turns texts into a float32 matrix (one row per text).
+    `namespace` identifies the vector space, so indexes built with different
+    backends (or settings) are stored separately and never mixed.
+    """
+
+    name = "base"
+
+    @property
+    def namespace(self) -> str:
+        return self.name
+
+    def fit(self, texts: list):
+        """Optional: learn corpus statistics before embedding. No-op by default."""
+
+    def embed(self, texts: list) -> np.ndarray:
+        raise NotImplementedError
+
+    def get_state(self) -> dict:
+        """Arrays needed to embed new texts consistently after a reload."""
+        return {}
+
+    def set_state(self, state: dict):
+        pass
+
+
+class OpenAIEmbeddingBackend(EmbeddingBackend):
+    """Remote embeddings through the batched embedding pipeline."""
+
+    name = "openai"
+
+    def __init__(self, model: str = EMBEDDING_MODEL, **pipeline_options):
+        self.model = model
+        self.pipeline_options = pipeline_options
+
+    @property
+    def namespace(self) -> str:
+        return f"{self.name}-{self.model}"
+
+    def embed(self, texts: list) -> np.ndarray:
+        return np.asarray(embed_texts(texts, model=self.model, **self.pipeline_options), dtype=np.float32)
+
+
+class LocalHashingBackend(EmbeddingBackend):
+    """
+    Offline backend: hashed word and character n-grams weighted with TF-IDF.
+
+    Features are hashed into `n_features` buckets with a stable hash (crc32), so
+    no vocabulary has to be stored. Vectors are built as a sparse matrix and
+    L2-normalised, which makes the dot product equal to cosine similarity.
+    """
+
+    name = "local"
+
+    def __init__(self, n_features: int = 2048, word_ngrams=(1, 2), char_ngrams=(3, 5)):
+        self.n_features = n_features
+        self.word_ngrams = word_ngrams
+        self.char_ngrams = char_ngrams
+        self.idf = np.ones(n_features, dtype=np.float32)
+        self._bucket_cache = {}
+
+    @property
+    def namespace(self) -> str:
+        return f"{self.name}-hashing-{self.n_features}"
+
+    def _bucket(self, feature: str) -> int:
+        bucket = self._bucket_cache.get(feature)
+        if bucket is None:
+            if len(self._bucket_cache) >= MAX_CACHED_FEATURES:
+                self._bucket_cache.clear()
+            bucket = zlib.crc32(feature.encode("utf-8")) % self.n_features
+            self._bucket_cache[feature] = bucket
+        return bucket
+
+    def _features(self, text: str) -> list:
+        text = text.lower()
+        features = []
+
+        words = WORD_RE.findall(text)
+        for n in range(self.word_ngrams[0], self.word_ngrams[1] + 1):
+            features.extend("w " + " ".join(words[i:i + n]) for i in range(len(words) - n + 1))
+
+        padded = f" {' '.join(text.split())} "
+        for n in range(self.char_ngrams[0], self.char_ngrams[1] + 1):
+            features.extend("c " + padded[i:i + n] for i in range(len(padded) - n + 1))
+
+        return [self._bucket(f) for f in features]
+
+    def _term_counts(self, texts: list) -> sp.csr_matrix:
+        indptr = [0]
+        indices = []
+        for text in texts:
+            indices.extend(self._features(text))
+            indptr.append(len(indices))
+
+        counts = sp.csr_matrix(
+            (np.ones(len(indices), dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(len(texts), self.n_features)
+        )
+        counts.sum_duplicates()
+        return counts
+
+    def fit(self, texts: list):
+        counts = self._term_counts(texts)
+        document_frequency = np.bincount(counts.indices, minlength=self.n_features)
+        # Smoothed IDF (same formula as sklearn's TfidfTransformer)
+        self.idf = (np.log((1 + len(texts)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    def embed(self, texts: list) -> np.ndarray:
+        counts = self._term_counts(texts)
+
+        # Sublinear TF, then IDF weighting, all on the sparse data array
+        counts.data = (1 + np.log(counts.data)) * self.idf[counts.indices]
+
+        vectors = counts.toarray()
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1
+        return vectors / norms
+
+    def get_state(self) -> dict:
+        return {"idf": self.idf}
+
+    def set_state(self, state: dict):
+        if "idf" in state:
+            self.idf = state["idf"].astype(np.float32)
+
+
+# ================================
+# Backend selection
+# ================================
+
+BACKENDS = {
+    OpenAIEmbeddingBackend.name: OpenAIEmbeddingBackend,
+    LocalHashingBackend.name: LocalHashingBackend,
+}
+
+
+def get_backend(name: str = None, **options) -> EmbeddingBackend:
+    """
+    Returns a backend by name. Defaults to the EMBEDDING_BACKEND environment
+    variable ("openai" when unset).
+    """
+    name = name or os.getenv("EMBEDDING_BACKEND", OpenAIEmbeddingBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"❌ Unknown embedding backend '{name}'. Available: {', '.join(BACKENDS)}")
+    return BACKENDS[name](**options)
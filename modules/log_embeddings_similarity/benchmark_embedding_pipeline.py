@@ -0,0 +1,128 @@
+"""
+Benchmark: embedding throughput against a local mock embeddings endpoint.
+
+Starts a small HTTP server that imitates POST /v1/embeddings with injected latency
+(and optional random failures), then embeds the same synthetic log corpus with
+different concurrency settings.
+
+Run from the repository root:
+    python -m modules.log_embeddings_similarity.benchmark_embedding_pipeline --latency 0.15
+"""
+
+import argparse
+import base64
+import json
+import random
+import struct
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+
+from modules.log_embeddings_similarity.embedding_pipeline import embed_texts
+
+MOCK_DIMENSIONS = 1536
+
+
+def make_mock_handler(latency: float, jitter: float, failure_rate: float):
+    class MockEmbeddingsHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+
+            time.sleep(latency + random.uniform(0, jitter))
+
+            if random.random() < failure_rate:
+                self.send_response(500)
+                self.send_header("Content-Type", "application/json")
+                self.end_headers()
+                self.wfile.write(b'{"error": {"message": "injected failure"}}')
+                return
+
+            data = []
+            for i, text in enumerate(inputs):
+                rng = random.Random(text)
+                vector = [rng.uniform(-1, 1) for _ in range(MOCK_DIMENSIONS)]
+                if body.get("encoding_format") == "base64":
+                    packed = struct.pack(f"{MOCK_DIMENSIONS}f", *vector)
+                    embedding = base64.b64encode(packed).decode()
+                else:
+                    embedding = vector
+                data.append({"object": "embedding", "index": i, "embedding": embedding})
+
+            payload = json.dumps({
+                "object": "list",
+                "data": data,
+                "model": body["model"],
+                "usage": {"prompt_tokens": 0, "total_tokens": 0}
+            }).encode()
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def log_message(self, *args):
+            pass
+
+    return MockEmbeddingsHandler
+
+
+def make_corpus(size: int) -> list:
+    templates = [
+        "[{t}] Error: Connection refused on port {n}",
+        "[{t}] Error: Timeout waiting for response after {n} ms",
+        "[{t}] Error: Out of memory ({n}) while building image",
+        "[{t}] Error: Package not found: lib-{n}@1.2.3",
+        "[{t}] Deployment failed: service {n} returned 500 internal server error",
+    ]
+    return [
+        random.choice(templates).format(t=f"12:{i % 60:02d}:{i % 59:02d}", n=i)
+        for i in range(size)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", type=int, default=2000, help="Number of log lines to embed")
+    parser.add_argument("--latency", type=float, default=0.15, help="Injected latency per request (seconds)")
+    parser.add_argument("--jitter", type=float, default=0.05, help="Extra random latency per request (seconds)")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests that fail with HTTP 500")
+    parser.add_argument("--batch-tokens", type=int, default=2000, help="Token budget per batch")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_mock_handler(args.latency, args.jitter, args.failure_rate))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = openai.OpenAI(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1",
+        api_key="mock",
+        max_retries=0
+    )
+
+    corpus = make_corpus(args.texts)
+    print(f"📊 {len(corpus)} texts | latency {args.latency}s (+{args.jitter}s jitter) | batch budget {args.batch_tokens} tokens")
+
+    baseline = None
+    for concurrency in args.concurrency:
+        start = time.perf_counter()
+        vectors = embed_texts(
+            corpus, client=client,
+            max_batch_tokens=args.batch_tokens,
+            max_concurrency=concurrency,
+            retry_backoff=0.1
+        )
+        elapsed = time.perf_counter() - start
+        assert len(vectors) == len(corpus) and all(v is not None for v in vectors)
+
+        throughput = len(corpus) / elapsed
+        baseline = baseline or throughput
+        print(f"• concurrency={concurrency:<3} {elapsed:6.2f}s  {throughput:8.1f} texts/s  ({throughput / baseline:.1f}x)")
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark: memory and recall of quantised index storage (float16 / int8 + exact re-ranking).
+
+Uses synthetic clustered unit vectors shaped like text-embedding-3-small output
+(1536 dims), so no API calls are needed. Recall@k is measured against exact
+float32 search.
+
+Run from the repository root:
+    python -m modules.log_embeddings_similarity.benchmark_quantization --vectors 200000
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from modules.log_embeddings_similarity.backends import OpenAIEmbeddingBackend
+from modules.log_embeddings_similarity.logic import SimilarityIndex, STORAGE_MODES, _normalize, _top_k
+
+
+def make_vectors(count: int, dimensions: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dimensions), dtype=np.float32)
+    vectors = centers[rng.integers(0, clusters, count)]
+    vectors += 0.6 * rng.standard_normal((count, dimensions), dtype=np.float32)
+    return _normalize(vectors)
+
+
+def recall(found: list, expected: list) -> float:
+    hits = sum(len(set(f) & set(e)) for f, e in zip(found, expected))
+    return hits / sum(len(e) for e in expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dimensions, args.clusters)
+    queries = make_vectors(args.queries, args.dimensions, args.clusters, seed=1)
+    texts = [str(i) for i in range(args.vectors)]
+
+    float64_bytes = args.vectors * args.dimensions * 8
+    print(f"📊 {args.vectors} x {args.dimensions} vectors | {args.queries} queries | recall@{args.k}")
+    print(f"• float64 (np.array baseline): {float64_bytes / 2**20:9.1f} MB")
+
+    expected = None
+    with tempfile.TemporaryDirectory() as index_dir:
+        for storage in STORAGE_MODES:
+            index = SimilarityIndex(
+                backend=OpenAIEmbeddingBackend(),
+                index_dir=index_dir,
+                storage=storage,
+                rerank_factor=args.rerank_factor
+            )
+            index.add_vectors(texts, vectors)
+            index.save()
+
+            start = time.perf_counter()
+            found = [index.search(q, args.k)[0] for q in queries]
+            latency_ms = (time.perf_counter() - start) * 1000 / args.queries
+
+            if expected is None:
+                expected = found
+            coarse = [_top_k(index.compact_scores(q), args.k) for q in queries]
+
+            mb = index.memory_bytes() / 2**20
+            print(
+                f"• {storage:<8} RAM {mb:9.1f} MB ({float64_bytes / index.memory_bytes():4.1f}x smaller) | "
+                f"recall compact-only {recall(coarse, expected):.4f} | "
+                f"recall re-ranked {recall(found, expected):.4f} | {latency_ms:.1f} ms/query"
+            )
+
+
+if __name__ == "__main__":
+    main()
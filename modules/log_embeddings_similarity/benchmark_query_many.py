@@ -0,0 +1,60 @@
+"""
+Benchmark: one query at a time vs query_many-style batched scoring.
+
+Simulates an incident storm (many failures at once) against a synthetic
+1536-dim index, timing a loop of single searches against one blocked
+(Q x D) @ (D x N) search. Embedding requests are not included here: with the
+OpenAI backend query_many sends all queries through one batched pipeline run
+instead of one request per failure.
+
+Run from the repository root:
+    python -m modules.log_embeddings_similarity.benchmark_query_many --queries 200
+"""
+
+import argparse
+import tempfile
+import time
+
+import numpy as np
+
+from modules.log_embeddings_similarity.backends import OpenAIEmbeddingBackend
+from modules.log_embeddings_similarity.benchmark_quantization import make_vectors
+from modules.log_embeddings_similarity.logic import SimilarityIndex, STORAGE_MODES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=100_000)
+    parser.add_argument("--dimensions", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    vectors = make_vectors(args.vectors, args.dimensions, clusters=500)
+    queries = make_vectors(args.queries, args.dimensions, clusters=500, seed=1)
+    texts = [str(i) for i in range(args.vectors)]
+    print(f"📊 {args.queries} queries against {args.vectors} x {args.dimensions} vectors, top-{args.k}")
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        for storage in STORAGE_MODES:
+            index = SimilarityIndex(backend=OpenAIEmbeddingBackend(), index_dir=index_dir, storage=storage)
+            index.add_vectors(texts, vectors)
+            index.save()
+
+            start = time.perf_counter()
+            single = [index.search(q, args.k) for q in queries]
+            single_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            batched = index.search_many(queries, args.k)
+            batched_seconds = time.perf_counter() - start
+
+            same = all(np.array_equal(a[0], b[0]) for a, b in zip(single, batched))
+            print(
+                f"• {storage:<8} one-by-one {single_seconds:7.2f}s | batched {batched_seconds:6.2f}s | "
+                f"{single_seconds / batched_seconds:5.1f}x faster | same results: {same}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+import contextvars
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import openai
+
+from modules.llm_client.cassette import wrap_client
+from modules.token_counter.logic import count_tokens_many
+from modules.token_counter.usage import usage_tracker
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# Limits of the embeddings endpoint (per input / per request)
+MAX_TOKENS_PER_INPUT = 8191
+MAX_INPUTS_PER_REQUEST = 2048
+
+# Defaults for our own batching (kept well under the request limits)
+DEFAULT_MAX_BATCH_TOKENS = 50_000
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 3
+
+
+# ================================
+# Rate limiting
+# ================================
+
+class TokenBucket:
+    """
+    Thread-safe token bucket that refills continuously at `per_minute` units per minute.
+    acquire() blocks until enough units are available.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.available = float(per_minute)
+        self.refill_per_second = per_minute / 60.0
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: int = 1):
+        # A single request larger than the bucket can still go through once the bucket is full
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.available = min(
+                    self.capacity,
+                    self.available + (now - self.updated_at) * self.refill_per_second
+                )
+                self.updated_at = now
+                if self.available >= amount:
+                    self.available -= amount
+                    return
+                wait = (amount - self.available) / self.refill_per_second
+            time.sleep(wait)
+
+
+class RateLimiter:
+    """
+    Combines a requests-per-minute and a tokens-per-minute bucket.
+    Passing None for a limit disables that bucket.
+    """
+
+    def __init__(self, rpm: int = None, tpm: int = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+
+    def acquire(self, tokens: int):
+        if self.requests:
+            self.requests.acquire(1)
+        if self.tokens:
+            self.tokens.acquire(tokens)
+
+
+# ================================
+# Batching
+# ================================
+
+def pack_batches(token_counts: list, max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                 max_batch_size: int = MAX_INPUTS_PER_REQUEST) -> list:
+    """
+    Greedily packs inputs (in order) into batches that stay under the token budget
+    and the per-request input limit. Returns a list of (indices, batch_tokens).
+    """
+    batches = []
+    current, current_tokens = [], 0
+
+    for i, tokens in enumerate(token_counts):
+        if tokens > MAX_TOKENS_PER_INPUT:
+            raise ValueError(
+                f"❌ Input {i} has {tokens} tokens (limit {MAX_TOKENS_PER_INPUT}). Split it into smaller chunks first."
+            )
+        if current and (current_tokens + tokens > max_batch_tokens or len(current) >= max_batch_size):
+            batches.append((current, current_tokens))
+            current, current_tokens = [], 0
+        current.append(i)
+        current_tokens += tokens
+
+    if current:
+        batches.append((current, current_tokens))
+
+    return batches
+
+
+def _embed_batch(client, texts: list, model: str, tokens: int, limiter: RateLimiter,
+                 max_retries: int, retry_backoff: float) -> list:
+    """
+    Embeds one batch. A failed batch is retried on its own with exponential backoff,
+    without affecting batches that already succeeded.
+    """
+    attempt = 0
+    while True:
+        limiter.acquire(tokens)
+        try:
+            response = client.embeddings.create(input=texts, model=model)
+            usage_tracker.record("embedding", model, response)
+            # The endpoint returns an index per item; don't rely on response ordering
+            items = sorted(response.data, key=lambda item: item.index)
+            return [item.embedding for item in items]
+        except Exception as e:
+            if attempt >= max_retries:
+                raise
+            delay = retry_backoff * (2 ** attempt)
+            print(f"⚠️ Embedding batch of {len(texts)} failed ({e}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+            attempt += 1
+
+
+def embed_texts(texts: list, model: str = EMBEDDING_MODEL, client=None,
+                max_batch_tokens: int = DEFAULT_MAX_BATCH_TOKENS,
+                max_batch_size: int = MAX_INPUTS_PER_REQUEST,
+                max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                rpm: int = None, tpm: int = None,
+                max_retries: int = DEFAULT_MAX_RETRIES,
+                retry_backoff: float = 1.0) -> list:
+    """
+    Embeds a list of texts using token-aware batches sent concurrently.
+
+    - Batches are packed under `max_batch_tokens` (measured with token_counter).
+    - Up to `max_concurrency` requests are in flight at once.
+    - Optional `rpm` / `tpm` limits are enforced with token buckets.
+    - Returned vectors are in the same order as `texts`.
+    """
+    if not texts:
+        return []
+
+    client = wrap_client(client or openai)
+    token_counts = count_tokens_many(texts, model=model)
+    batches = pack_batches(token_counts, max_batch_tokens, max_batch_size)
+    limiter = RateLimiter(rpm=rpm, tpm=tpm)
+
+    vectors = [None] * len(texts)
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as pool:
+        futures = [
+            # Each batch runs in a copy of the caller's context, so usage keeps the caller's scenario
+            (indices, pool.submit(
+                contextvars.copy_context().run, _embed_batch, client, [texts[i] for i in indices], model,
+                batch_tokens, limiter, max_retries, retry_backoff
+            ))
+            for indices, batch_tokens in batches
+        ]
+        for indices, future in futures:
+            for i, vector in zip(indices, future.result()):
+                vectors[i] = vector
+
+    return vectors
@@ -0,0 +1,85 @@
+import json
+import os
+import time
+from pathlib import Path
+
+from modules.llm_client.cassette import cassette_active
+from modules.log_embeddings_similarity.logic import INDEX_DIR, SimilarityIndex
+
+# KNOWN_FIXES=1 turns the fast path on; off by default: no lookups, nothing written to disk
+KNOWN_FIXES = os.getenv("KNOWN_FIXES", "0") == "1"
+if KNOWN_FIXES and cassette_active():
+    # A hit skips the LLM, so a cassette recording / replay could diverge
+    print("📼 Cassette active: known-fix store disabled")
+    KNOWN_FIXES = False
+# Where solved failures are kept (one sub-directory per kind)
+KNOWN_FIX_DIR = Path(os.getenv("KNOWN_FIX_DIR", str(INDEX_DIR / "known_fixes")))
+# Minimum cosine similarity for reusing a stored fix instead of calling the LLM
+KNOWN_FIX_THRESHOLD = float(os.getenv("KNOWN_FIX_THRESHOLD", "0.92"))
+
+
+class KnownFixStore:
+    """
+    Failure logs stored together with the fix that solved them
+    (a v1 plan or the v2 tool calls), looked up before calling the LLM.
+
+    lookup() returns (fix, similarity) when a stored failure scores at or above
+    the threshold, otherwise None so the caller falls back to the LLM.
+    """
+
+    def __init__(self, kind: str, backend=None, index_dir: Path = KNOWN_FIX_DIR,
+                 threshold: float = KNOWN_FIX_THRESHOLD):
+        self.index = SimilarityIndex(backend=backend, index_dir=Path(index_dir) / kind)
+        self.threshold = threshold
+        self.fixes = []
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "lookup_seconds": 0.0,
+            "llm_calls": 0,
+            "llm_seconds": 0.0,
+        }
+
+        fixes_file = self.index.path / "fixes.json"
+        if fixes_file.exists():
+            self.index.load()
+            self.fixes = json.loads(fixes_file.read_text(encoding="utf-8"))
+
+    def lookup(self, log_text: str):
+        start = time.perf_counter()
+        self.stats["lookups"] += 1
+        try:
+            if not self.fixes:
+                return None
+            indices, scores = self.index.search(self.index.backend.embed([log_text])[0], k=1)
+            if scores[0] < self.threshold:
+                return None
+            self.stats["hits"] += 1
+            return self.fixes[indices[0]], float(scores[0])
+        finally:
+            self.stats["lookup_seconds"] += time.perf_counter() - start
+
+    def record(self, log_text: str, fix):
+        """Stores a solved failure with its fix and persists the store (only call it for runs that succeeded)."""
+        self.index.add([log_text])
+        self.fixes.append(fix)
+        self.index.save()
+        (self.index.path / "fixes.json").write_text(json.dumps(self.fixes), encoding="utf-8")
+
+    def record_llm_call(self, seconds: float):
+        """Latency of an LLM fallback, used to estimate the time saved by hits."""
+        self.stats["llm_calls"] += 1
+        self.stats["llm_seconds"] += seconds
+
+    def summary(self) -> dict:
+        lookups, hits = self.stats["lookups"], self.stats["hits"]
+        avg_llm = self.stats["llm_seconds"] / self.stats["llm_calls"] if self.stats["llm_calls"] else 0.0
+        avg_lookup = self.stats["lookup_seconds"] / lookups if lookups else 0.0
+        return {
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "avg_llm_seconds": avg_llm,
+            "avg_lookup_seconds": avg_lookup,
+            "estimated_seconds_saved": hits * max(avg_llm - avg_lookup, 0.0),
+        }
@@ -1,9 +1,12 @@
+import json
 import openai
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
+from modules.log_embeddings_similarity.backends import get_backend
+
 # OPTIONAL: Uncomment this section if you want to connect to a PostgreSQL database on AWS
 # import psycopg2
 
@@ -12,89 +15,322 @@ load_dotenv()
 api_key = os.getenv("OPEN_AI_API_KEY")
 openai.api_key = api_key
 
-# ✅ Step 2: Define a list of chunks (e.g., log entries, paragraphs, etc.)
-'''
-📌 Reminders: 
-* This is preproccesing step so later make a fork and edit so DB will only take new logs and solutions
-* In order to maximize the use of the LogEmbedder, insert only failiure logs with there solution. 
-Every debugged log should be added to the DB with solution 
-
-* This example uses simple log messages as chunks.
-If using a text file or PDF, you'd split it into chunks using:
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-'''
-chunks = [
-    "User clicked button but nothing happened",
-    "Connection timeout while calling API",
-    "Missing field 'username' in request body",
-    "Cannot connect to database at 10.0.1.7",
-    "Service returned 500 internal server error",
-    "Failed to load user profile from backend",
-    "Password field is empty in form submission"
-]
-
-# OPTIONAL: Connect to AWS PostgreSQL and fetch chunks instead of hardcoding
-"""
-# 🔁 Uncomment this block to pull chunks from PostgreSQL (AWS RDS)
-connection = psycopg2.connect(
-    host="your-db-host.amazonaws.com",
-    port=5432,
-    user="your-username",
-    password="your-password",
-    dbname="your-database"
-)
-cursor = connection.cursor()
-cursor.execute("SELECT chunk_text FROM logs_table")
-chunks = [row[0] for row in cursor.fetchall()]
-"""
-
-# ✅ Step 3: Generate embeddings for all chunks (batch mode)
-embedding_response = openai.embeddings.create(
-    input=chunks,
-    model="text-embedding-3-small"
-)
-
-# Extract vectors
-chunk_vectors = [item.embedding for item in embedding_response.data]
-
-# OPTIONAL: Store embeddings to DB if needed
-"""
-# 🔁 Uncomment this block to store embeddings into the DB
-cursor.execute("DELETE FROM chunk_embeddings")  # optional: clear existing
-for i, vector in enumerate(chunk_vectors):
-    cursor.execute(
-        "INSERT INTO chunk_embeddings (chunk_text, embedding) VALUES (%s, %s)",
-        (chunks[i], vector)
+# Every backend gets its own sub-folder (namespace) under this directory
+INDEX_DIR = Path(os.getenv("EMBEDDING_INDEX_DIR", "./embedding_index"))
+
+# In-memory representation used for scoring:
+# - float32: full vectors in RAM, exact scores
+# - float16 / int8: compact vectors in RAM, full vectors memory-mapped from disk for re-ranking
+STORAGE_MODES = ("float32", "float16", "int8")
+INDEX_STORAGE = os.getenv("EMBEDDING_INDEX_STORAGE", "float32")
+
+# How many compact-score candidates per requested result are re-ranked exactly
+RERANK_FACTOR = 10
+
+# Rows converted to float32 at a time when scoring compact vectors
+SCORE_BLOCK_ROWS = 65_536
+
+# Upper bound on the (queries x rows) score block of query_many (16M float32 = 64 MB)
+MAX_BLOCK_SCORES = 16_777_216
+
+
+# ================================
+# Similarity index
+# ================================
+
+class SimilarityIndex:
+    """
+    Stores texts with their embeddings and returns the most similar ones for a query.
+    The backend is chosen with EMBEDDING_BACKEND ("openai" or "local") unless passed in.
+
+    With a quantised `storage` ("float16" or "int8"), candidates are scored on the
+    compact vectors and the best `k * rerank_factor` are re-ranked exactly against the
+    full-precision vectors, which stay on disk (memory-mapped) once the index is saved.
+    """
+
+    def __init__(self, backend=None, index_dir: Path = INDEX_DIR,
+                 storage: str = INDEX_STORAGE, rerank_factor: int = RERANK_FACTOR):
+        if storage not in STORAGE_MODES:
+            raise ValueError(f"❌ Unknown storage '{storage}'. Available: {', '.join(STORAGE_MODES)}")
+        self.backend = backend or get_backend()
+        self.path = Path(index_dir) / self.backend.namespace
+        self.storage = storage
+        self.rerank_factor = rerank_factor
+        self.texts = []
+        self.vectors = None   # full precision (float32), possibly memory-mapped
+        self.codes = None     # compact vectors (float16 / int8)
+        self.scales = None    # per-vector scale for int8
+
+    def build(self, texts: list):
+        """Fits the backend on the corpus and embeds every text."""
+        self.backend.fit(texts)
+        self.texts, self.vectors, self.codes, self.scales = [], None, None, None
+        self.add_vectors(texts, self.backend.embed(texts))
+        return self
+
+    def add(self, texts: list):
+        """Embeds and appends new texts (backend statistics are not refitted)."""
+        self.add_vectors(texts, self.backend.embed(texts))
+
+    def add_vectors(self, texts: list, vectors):
+        """Appends texts with already computed embeddings (e.g. loaded from a DB)."""
+        vectors = _normalize(np.asarray(vectors, dtype=np.float32))
+        self.vectors = vectors if self.vectors is None else np.concatenate([self.vectors, vectors])
+
+        codes, scales = _quantize(vectors, self.storage)
+        if codes is not None:
+            self.codes = codes if self.codes is None else np.concatenate([self.codes, codes])
+        if scales is not None:
+            self.scales = scales if self.scales is None else np.concatenate([self.scales, scales])
+
+        self.texts.extend(texts)
+
+    def query(self, text: str, k: int = 3) -> list:
+        """Returns up to k (text, similarity) pairs, most similar first."""
+        return self.query_many([text], k)[0]
+
+    def query_many(self, texts: list, k: int = 3) -> list:
+        """
+        Scores many queries at once (e.g. all jobs broken by one bad commit).
+        Queries are embedded together and scored with blocked matrix products.
+        Returns one list of (text, similarity) pairs per query.
+        """
+        if not texts:
+            return []
+        if not self.texts:
+            return [[] for _ in texts]
+        results = self.search_many(self.backend.embed(texts), k)
+        return [
+            [(self.texts[i], float(score)) for i, score in zip(indices, scores)]
+            for indices, scores in results
+        ]
+
+    def search(self, query_vector, k: int = 3):
+        """Returns (indices, cosine similarities) of the k nearest stored vectors."""
+        return self.search_many(np.asarray(query_vector)[None, :], k)[0]
+
+    def search_many(self, query_vectors, k: int = 3) -> list:
+        """
+        Returns (indices, cosine similarities) of the k nearest stored vectors for every query.
+
+        The (Q x D) @ (D x N) product is computed over row blocks of the index so at most
+        MAX_BLOCK_SCORES scores exist at a time; only the running top candidates are kept.
+        """
+        queries = _normalize(np.asarray(query_vectors, dtype=np.float32))
+        total = len(self.texts)
+        keep = k if self.codes is None else k * self.rerank_factor
+        block_rows = max(1, min(SCORE_BLOCK_ROWS, MAX_BLOCK_SCORES // len(queries)))
+
+        best_indices = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        for start in range(0, total, block_rows):
+            stop = min(start + block_rows, total)
+            scores = queries @ self._scoring_block(start, stop).T
+            if self.scales is not None:
+                scores *= self.scales[start:stop]
+
+            # Merge this block's candidates with the running best ones
+            block_top = _top_k_rows(scores, keep)
+            best_indices = np.concatenate([best_indices, block_top + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, block_top, axis=1)], axis=1)
+            if best_indices.shape[1] > keep:
+                top = _top_k_rows(best_scores, keep)
+                best_indices = np.take_along_axis(best_indices, top, axis=1)
+                best_scores = np.take_along_axis(best_scores, top, axis=1)
+
+        results = []
+        for query, indices, scores in zip(queries, best_indices, best_scores):
+            if self.codes is None:
+                order = _top_k(scores, k)
+                results.append((indices[order], scores[order]))
+            else:
+                # Re-rank the best candidates exactly; sorted indices keep mmap reads sequential
+                candidates = np.sort(indices)
+                exact = np.asarray(self.vectors[candidates]) @ query
+                order = _top_k(exact, k)
+                results.append((candidates[order], exact[order]))
+        return results
+
+    def _scoring_block(self, start: int, stop: int) -> np.ndarray:
+        """Rows [start, stop) of the in-memory representation as float32."""
+        if self.codes is None:
+            return self.vectors[start:stop]
+        return self.codes[start:stop].astype(np.float32)
+
+    def compact_scores(self, query_vector: np.ndarray) -> np.ndarray:
+        """Similarity of a normalised query against every stored vector, using the in-memory representation."""
+        scores = np.concatenate([
+            self._scoring_block(start, start + SCORE_BLOCK_ROWS) @ query_vector
+            for start in range(0, len(self.texts), SCORE_BLOCK_ROWS)
+        ])
+        if self.scales is not None:
+            scores *= self.scales
+        return scores
+
+    def memory_bytes(self) -> int:
+        """RAM held by the vectors used for scoring (memory-mapped arrays are not counted)."""
+        arrays = [self.codes, self.scales]
+        if not isinstance(self.vectors, np.memmap):
+            arrays.append(self.vectors)
+        return sum(a.nbytes for a in arrays if a is not None)
+
+    def save(self):
+        self.path.mkdir(parents=True, exist_ok=True)
+        (self.path / "texts.json").write_text(json.dumps(self.texts), encoding="utf-8")
+        # Write next to the old file and swap, since the old one may still be memory-mapped
+        tmp_file = self.path / "vectors.tmp.npy"
+        np.save(tmp_file, self.vectors)
+        os.replace(tmp_file, self.path / "vectors.npy")
+        np.savez(self.path / "backend_state.npz", **self.backend.get_state())
+
+        # Drop compact files of other storage modes from earlier saves, they no longer match vectors.npy
+        stale_files = [f for f in self.path.glob("codes.*.npy") if f.name != f"codes.{self.storage}.npy"]
+        if self.storage != "int8":
+            stale_files.append(self.path / "scales.npy")
+        for stale_file in stale_files:
+            stale_file.unlink(missing_ok=True)
+
+        if self.codes is not None:
+            np.save(self.path / f"codes.{self.storage}.npy", self.codes)
+            if self.scales is not None:
+                np.save(self.path / "scales.npy", self.scales)
+            # Full precision vectors are only needed for re-ranking, serve them from disk
+            self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        return self.path
+
+    def load(self):
+        if not (self.path / "texts.json").exists():
+            raise FileNotFoundError(f"❌ No index found at {self.path}")
+        self.texts = json.loads((self.path / "texts.json").read_text(encoding="utf-8"))
+        with np.load(self.path / "backend_state.npz") as state:
+            self.backend.set_state(dict(state))
+
+        if self.storage == "float32":
+            self.vectors = np.load(self.path / "vectors.npy")
+            self.codes, self.scales = None, None
+            return self
+
+        self.vectors = np.load(self.path / "vectors.npy", mmap_mode="r")
+        codes_file = self.path / f"codes.{self.storage}.npy"
+        scales_file = self.path / "scales.npy"
+        self.codes = np.load(codes_file) if codes_file.exists() else None
+        self.scales = np.load(scales_file) if self.storage == "int8" and scales_file.exists() else None
+        usable = self.codes is not None and len(self.codes) == len(self.texts) and (
+            self.storage != "int8" or (self.scales is not None and len(self.scales) == len(self.texts)))
+        if not usable:
+            # Saved with another storage mode (or left over from an older save): quantise from disk block by block
+            blocks = [
+                _quantize(np.asarray(self.vectors[start:start + SCORE_BLOCK_ROWS]), self.storage)
+                for start in range(0, len(self.vectors), SCORE_BLOCK_ROWS)
+            ]
+            self.codes = np.concatenate([codes for codes, _ in blocks])
+            self.scales = np.concatenate([scales for _, scales in blocks]) if self.storage == "int8" else None
+        return self
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def _quantize(vectors: np.ndarray, storage: str):
+    """Returns (codes, scales) for a storage mode; (None, None) for full precision."""
+    if storage == "float16":
+        return vectors.astype(np.float16), None
+    if storage == "int8":
+        scales = np.abs(vectors).max(axis=1) / 127
+        scales[scales == 0] = 1
+        codes = np.round(vectors / scales[:, None]).astype(np.int8)
+        return codes, scales.astype(np.float32)
+    return None, None
+
+
+def _top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indices of the k highest scores in every row (unordered)."""
+    k = min(k, scores.shape[1])
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k highest scores, best first (argpartition, no full sort)."""
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+if __name__ == "__main__":
+    # ✅ Step 2: Define a list of chunks (e.g., log entries, paragraphs, etc.)
+    '''
+    📌 Reminders:
+    * This is preproccesing step so later make a fork and edit so DB will only take new logs and solutions
+    * In order to maximize the use of the LogEmbedder, insert only failiure logs with there solution.
+    Every debugged log should be added to the DB with solution
+
+    * This example uses simple log messages as chunks.
+    If using a text file or PDF, you'd split it into chunks using:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    * Set EMBEDDING_BACKEND=local to embed offline (no OpenAI calls).
+    '''
+    chunks = [
+        "User clicked button but nothing happened",
+        "Connection timeout while calling API",
+        "Missing field 'username' in request body",
+        "Cannot connect to database at 10.0.1.7",
+        "Service returned 500 internal server error",
+        "Failed to load user profile from backend",
+        "Password field is empty in form submission"
+    ]
+
+    # OPTIONAL: Connect to AWS PostgreSQL and fetch chunks instead of hardcoding
+    """
+    # 🔁 Uncomment this block to pull chunks from PostgreSQL (AWS RDS)
+    connection = psycopg2.connect(
+        host="your-db-host.amazonaws.com",
+        port=5432,
+        user="your-username",
+        password="your-password",
+        dbname="your-database"
     )
-connection.commit()
-"""
-
-# ✅ Step 4: Define a new input to compare against existing chunks
-chunk_to_compare = input("Enter a log to compare: ")
-#chunk_to_compare = "Database connection refused"
-
-# Embed the new input chunk
-compare_embedding = openai.embeddings.create(
-    input=chunk_to_compare,
-    model="text-embedding-3-small"
-).data[0].embedding
-
-# ✅ Step 5: Compute cosine similarity
-query_vector = np.array(compare_embedding).reshape(1, -1)
-chunk_matrix = np.array(chunk_vectors)
-similarities = cosine_similarity(query_vector, chunk_matrix)[0]
-
-# ✅ Step 6: Get top 3 most similar chunks
-top_k = np.argsort(similarities)[::-1][:3]
-
-# ✅ Step 7: Print results
-print("📋 Top similar chunks:")
-for i in top_k:
-    print(f"• Similar chunk: \"{chunks[i]}\"  |  Similarity Score: {similarities[i]:.2f}")
-
-# OPTIONAL: Close DB connection if used
-"""
-cursor.close()
-connection.close()
-"""
+    cursor = connection.cursor()
+    cursor.execute("SELECT chunk_text FROM logs_table")
+    chunks = [row[0] for row in cursor.fetchall()]
+    """
+
+    # ✅ Step 3: Generate embeddings for all chunks with the configured backend
+    # (the OpenAI backend batches, parallelises and rate limits requests - see embedding_pipeline.py)
+    index = SimilarityIndex().build(chunks)
+    print(f"💾 Index saved to {index.save()}")
+
+    # OPTIONAL: Store embeddings to DB if needed
+    """
+    # 🔁 Uncomment this block to store embeddings into the DB
+    cursor.execute("DELETE FROM chunk_embeddings")  # optional: clear existing
+    for i, vector in enumerate(index.vectors):
+        cursor.execute(
+            "INSERT INTO chunk_embeddings (chunk_text, embedding) VALUES (%s, %s)",
+            (chunks[i], vector.tolist())
+        )
+    connection.commit()
+    """
+
+    # ✅ Step 4: Define a new input to compare against existing chunks
+    chunk_to_compare = input("Enter a log to compare: ")
+    #chunk_to_compare = "Database connection refused"
+
+    # ✅ Step 5-6: Embed the input, compute cosine similarity and get top 3 most similar chunks
+    results = index.query(chunk_to_compare, k=3)
+
+    # ✅ Step 7: Print results
+    print("📋 Top similar chunks:")
+    for chunk, score in results:
+        print(f"• Similar chunk: \"{chunk}\"  |  Similarity Score: {score:.2f}")
 
+    # OPTIONAL: Close DB connection if used
+    """
+    cursor.close()
+    connection.close()
+    """
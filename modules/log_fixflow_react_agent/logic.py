@@ -1,20 +1,40 @@
+import asyncio
 import os
 import openai
 import re
 from dotenv import load_dotenv
 
+from modules.llm_client.actions import ActionError, ActionRegistry
+from modules.llm_client.async_runtime import AgentRuntime
+from modules.llm_client.cache import cached_chat_completion
+from modules.llm_client.history import ReActHistory
+from modules.llm_client.logic import stream_chat_until
+from modules.llm_client.sessions import FAILED, FINISHED, WAITING, SessionStore
+from modules.token_counter.usage import usage_tracker
+
 # 🔒 Load your OpenAI key from environment
 load_dotenv()
 openai.api_key = os.getenv("OPEN_AI_API_KEY")
 MODEL = "gpt-4o"
 
-# 🧠 Send a prompt to OpenAI and return the response
-def call_openai(prompt: str) -> str:
-    response = openai.chat.completions.create(
+# ⚡ STREAM_RESPONSES=1 streams responses and cancels them at <end>. Off by default: a cancelled
+# stream never gets its usage chunk, so cached tokens and cost are only estimated
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "0") == "1"
+
+# 🧠 Send the conversation to OpenAI and return the response
+def call_openai(messages: list) -> str:
+    if STREAM_RESPONSES:
+        result = stream_chat_until(messages, MODEL, stage="react_step", temperature=0)
+        print(f"⏱️ First token {result['ttft_s']:.2f}s | total {result['total_s']:.2f}s"
+              f"{' | stopped at <end>' if result['stopped_early'] else ''}")
+        return result["text"]
+
+    response = cached_chat_completion(
         model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
+        messages=messages,
         temperature=0
     )
+    usage_tracker.record("react_step", MODEL, response, messages=messages)
     return response.choices[0].message.content
 
 # 🔍 Extract Thought, Action, and Observation from LLM output block
@@ -35,129 +55,217 @@ def extract_react_block(text: str) -> dict:
         "observation": observation.group(1).strip() if observation else "",
     }
 
-# 🧱 Builds full prompt (used when not waiting for input)
-def build_full_prompt(history: list, log_text: str) -> str:
-    intro = (
-        "You are a log analysis agent using ReAct logic.\n"
-        "Your task is to analyze the error log below and determine the cause of the failure.\n"
-        "You must never assume the user’s answer. If you perform ask_user(\"...\") – stop and wait for input.\n"
-        "Respond only in this format:\n"
-        "<start>\nThought: ...\nAction: ...\nObservation: ...\n<end>\n\n"
-    )
+# 🔧 Available actions (in real world you'd replace the simulations with actual tools)
+actions = ActionRegistry()
+actions.control("ask_user", "question")  # the session waits for the user's answer
+actions.control("suggest_fix")           # the session ends
 
-    log_block = f"<log>\n{log_text}\n</log>\n\n"
+@actions.action("read_log")
+def read_log(context):
+    return context["log"]
 
-    # Add all blocks including ask_user blocks
-    history_block = "\n".join([
-        f"<start>\nThought: {h['thought']}\nAction: {h['action']}\nObservation: {h['observation']}\n<end>"
-        for h in history
-    ])
+@actions.action("search_error", "keyword", timeout_s=10)
+def search_error(context, keyword):
+    return f"🧠 Simulated result: Found threads about '{keyword}'"
 
-    return intro + history_block + "\n" + log_block
+@actions.action("read_output", "handle")
+def read_output(context, handle):
+    try:
+        return context["store"].get(handle)
+    except KeyError as e:
+        return e.args[0]
 
-# 🧱 Builds partial prompt that EXCLUDES ask_user blocks waiting for input
-def build_prompt_until_question(history: list, log_text: str) -> str:
-    intro = (
-        "You are a log analysis agent using ReAct logic.\n"
-        "Your task is to analyze the error log below and determine the cause of the failure.\n"
-        "You must never assume the user’s answer. If you perform ask_user(\"...\") – stop and wait for input.\n"
-        "Respond only in this format:\n"
-        "<start>\nThought: ...\nAction: ...\nObservation: ...\n<end>\n\n"
-    )
+# 🧾 Static prefix (instructions + log): identical for every step of a session, so it is prompt-cacheable
+SYSTEM_PROMPT = (
+    "You are a log analysis agent using ReAct logic.\n"
+    "Your task is to analyze the error log below and determine the cause of the failure.\n"
+    "You must never assume the user’s answer. If you perform ask_user(\"...\") – stop and wait for input.\n"
+    f"Available actions: {actions.signatures()}\n"
+    "Respond only in this format:\n"
+    "<start>\nThought: ...\nAction: ...\n<end>\n"
+    "The observation of your action, or the user's answer to ask_user, comes back in the next message.\n"
+    "Long outputs are shown as [output <id>: ...]; read_output(\"<id>\") shows one in full again.\n"
+)
 
-    log_block = f"<log>\n{log_text}\n</log>\n\n"
-    block_list = []
-
-    for h in history:
-        # ❌ If we are waiting for user input, don't include this block at all!
-        if h['action'].startswith("ask_user") and h['observation'] == "Waiting for user input.":
-            break
-        block_list.append(
-            f"<start>\nThought: {h['thought']}\nAction: {h['action']}\nObservation: {h['observation']}\n<end>"
-        )
-
-    history_block = "\n".join(block_list)
-    return intro + history_block + "\n" + log_block
-
-# 🔧 Simulate available actions (in real world you'd replace with actual tools)
-def simulate_action(action: str, log_text: str) -> str:
-    if action == "read_log()":
-        return log_text
-    elif action.startswith("search_error("):
-        term = re.search(r'search_error\("(.*?)"\)', action)
-        keyword = term.group(1) if term else "unknown"
-        return f"🧠 Simulated result: Found threads about '{keyword}'"
-    elif action == "suggest_fix()":
-        return "🛠️ Suggested fix generated."
-    else:
-        return "❓ Unknown action."
-
-# 🎯 Main agent loop
-def react_agent(log_text: str):
-    history = []  # Holds all past steps
+def start_messages(log_text: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"<log>\n{log_text}\n</log>"},
+    ]
 
-    while True:
-        # 🛑 If last step was ask_user and we're still waiting — request user input now
-        if history and history[-1]["action"].startswith("ask_user") and history[-1]["observation"] == "Waiting for user input.":
-            question = re.search(r'ask_user\("(.*?)"\)', history[-1]["action"])
-            question_text = question.group(1) if question else "Please answer:"
-            print(f"\n🤖 Agent asks: {question_text}")
-            user_input = input("🧑 Your answer: ")
-
-            # Save user input as the observation
-            history[-1]["observation"] = user_input
-            continue  # Rebuild prompt with new input
-
-        # 🧱 Choose prompt building method based on state
-        # Check if any block in history is waiting for user input
-        waiting_for_input = any(
-            h["action"].startswith("ask_user") and h["observation"] == "Waiting for user input."
-            for h in history
-        )
-
-        if waiting_for_input:
-            prompt = build_prompt_until_question(history, log_text)
-        else:
-            prompt = build_full_prompt(history, log_text)
-
-        # 🛰️ Send prompt to OpenAI
-        response = call_openai(prompt)
-        print("🔁 Agent response:\n", response)
-
-        # 🔍 Parse model output
-        try:
-            block = extract_react_block(response)
-        except Exception as e:
-            print("❌ Could not parse response:", e)
-            break
-
-        print(f"\n🧠 Thought: {block['thought']}\n⚙️ Action: {block['action']}")
-
-        # ✋ Intercept ask_user and pause until user provides real answer
-        if block["action"].startswith("ask_user"):
-            block["observation"] = "Waiting for user input."
-            history.append(block)
-            continue  # Wait for next loop to ask
-
-        # ✅ If done
-        if block["action"] == "suggest_fix()":
-            block["observation"] = "Fix suggestion complete."
-            print("✅ Agent has suggested a fix.")
-            history.append(block)
-            break
-
-        # ⚙️ Simulate action
-        block["observation"] = simulate_action(block["action"], log_text)
+# 🧱 Render one completed step once: the model's block, then what came back (tool output or the user's answer)
+def render_block(step: dict) -> list:
+    # Only a real answer to a parsed ask_user(); a malformed ask_user line gets its validation error as an observation
+    label = "User answer" if step.get("user_answer") else "Observation"
+    return [
+        {"role": "assistant", "content": f"<start>\nThought: {step['thought']}\nAction: {step['action']}\n<end>"},
+        {"role": "user", "content": f"{label}: {step['observation']}"},
+    ]
+
+# ⚙️ Observation for one Action line (a malformed one gets a message saying how to fix it)
+def simulate_action(action: str, log_text: str, store=None) -> str:
+    return actions.execute(action, {"log": log_text, "store": store})
+
+# 💾 Paused sessions live in the session store, not in this process
+session_store = SessionStore()
+
+def _save_session(store: SessionStore, session_id: str, status: str, history: list, conversation: ReActHistory,
+                  log_handle: str, question: str = None) -> dict:
+    store.save({
+        "session_id": session_id,
+        "status": status,
+        "question": question,
+        "log_handle": log_handle,
+        "history": history,
+        "conversation": conversation.to_dict(),
+    })
+    return {"session_id": session_id, "status": status, "question": question, "history": history}
+
+# 🎯 One agent step: handles the model's response. Returns (session result, None) once the session pauses or
+# stops, else (None, (block, name, args)) for the action the caller runs, or (None, None) after a malformed action
+def _handle_response(response: str, store: SessionStore, session_id: str, history: list,
+                     conversation: ReActHistory, log_handle: str) -> tuple:
+    print("🔁 Agent response:\n", response)
+
+    # 🔍 Parse model output
+    try:
+        block = extract_react_block(response)
+    except Exception as e:
+        print("❌ Could not parse response:", e)
+        return _save_session(store, session_id, FAILED, history, conversation, log_handle), None
+
+    print(f"\n🧠 Thought: {block['thought']}\n⚙️ Action: {block['action']}")
+
+    # 🧩 Validate the action; a malformed one goes back to the model as the observation
+    try:
+        name, args = actions.parse(block["action"])
+    except ActionError as e:
+        print(e)
+        block["observation"] = str(e)
+        history.append(block)
+        conversation.add(block)
+        return None, None
+
+    # ✋ Intercept ask_user: suspend the session until resume() brings the real answer
+    if name == "ask_user":
+        block["observation"] = "Waiting for user input."
+        history.append(block)
+        return _save_session(store, session_id, WAITING, history, conversation, log_handle, args[0]), None
+
+    # ✅ If done
+    if name == "suggest_fix":
+        block["observation"] = "Fix suggestion complete."
+        print("✅ Agent has suggested a fix.")
         history.append(block)
+        conversation.add(block)
+        return _save_session(store, session_id, FINISHED, history, conversation, log_handle), None
+
+    return None, (block, name, args)
+
+def _action_context(conversation: ReActHistory, log_handle: str) -> dict:
+    return {"log": conversation.store.get(log_handle), "store": conversation.store}
+
+# 📥 Record what an action returned as the step's observation
+def _add_observation(block: dict, name: str, observation: str, history: list, conversation: ReActHistory):
+    block["observation"] = observation
+    history.append(block)
+    conversation.add(block, inline=name == "read_output")
+
+# 🔁 Main agent loop: runs until the agent asks the user something or stops, then saves the session
+def _run_session(store: SessionStore, session_id: str, history: list, conversation: ReActHistory, log_handle: str) -> dict:
+    while True:
+        # 🛰️ Send conversation to OpenAI
+        response = call_openai(conversation.messages)
+        result, pending = _handle_response(response, store, session_id, history, conversation, log_handle)
+        if result:
+            return result
+        if pending:
+            # ⚙️ Run the action (under its timeout)
+            block, name, args = pending
+            observation = actions.run(name, args, _action_context(conversation, log_handle))
+            _add_observation(block, name, observation, history, conversation)
+
+# ⚡ Same loop on an asyncio AgentRuntime (shared concurrency limit, non-blocking LLM calls)
+async def _run_session_async(runtime: AgentRuntime, store: SessionStore, session_id: str, history: list,
+                             conversation: ReActHistory, log_handle: str) -> dict:
+    while True:
+        response = await runtime.chat(conversation.messages, MODEL, stage="react_step", temperature=0)
+        # Session file writes and LLM summaries block: keep them off the event loop
+        result, pending = await asyncio.to_thread(_handle_response, response.choices[0].message.content, store,
+                                                  session_id, history, conversation, log_handle)
+        if result:
+            return result
+        if pending:
+            # The timeout is awaited, so a slow action only holds up its own session
+            block, name, args = pending
+            observation = await actions.run_async(name, args, _action_context(conversation, log_handle))
+            await asyncio.to_thread(_add_observation, block, name, observation, history, conversation)
+
+def _new_session(log_text: str) -> tuple:
+    # Append-only conversation sent to the model; old observations are compacted to fit the budget
+    conversation = ReActHistory(start_messages(log_text), render_block, MODEL, seen={"log": log_text})
+    return conversation, conversation.store.put(log_text)
+
+def _restore_session(state: dict, answer: str) -> tuple:
+    log_text = state["conversation"]["outputs"][state["log_handle"]]
+    conversation = ReActHistory.from_dict(state["conversation"], start_messages(log_text), render_block, MODEL)
+    history = state["history"]
+
+    # Save user input as the observation; the block joins the conversation only now
+    history[-1]["observation"] = answer
+    history[-1]["user_answer"] = True
+    conversation.add(history[-1])
+    return history, conversation
+
+def start_session(log_text: str, store: SessionStore = session_store) -> dict:
+    """
+    Starts analysing a log. Returns {"session_id", "status", "question", "history"}:
+    status "waiting" means the agent asked `question` and the session is saved for resume().
+    """
+    conversation, log_handle = _new_session(log_text)
+    return _run_session(store, store.new_id(), [], conversation, log_handle)
+
+def resume(session_id: str, answer: str, store: SessionStore = session_store) -> dict:
+    """Continues a waiting session with the user's answer (from any process). Same result as start_session()."""
+    state = store.claim(session_id)
+    try:
+        history, conversation = _restore_session(state, answer)
+        return _run_session(store, session_id, history, conversation, state["log_handle"])
+    except BaseException:
+        store.release(session_id)  # leave it waiting, so the answer can be sent again
+        raise
+
+async def start_session_async(log_text: str, runtime: AgentRuntime, store: SessionStore = session_store) -> dict:
+    """start_session() as a coroutine; run many with runtime.run_all([...])."""
+    conversation, log_handle = _new_session(log_text)
+    return await _run_session_async(runtime, store, store.new_id(), [], conversation, log_handle)
+
+async def resume_async(session_id: str, answer: str, runtime: AgentRuntime, store: SessionStore = session_store) -> dict:
+    """resume() as a coroutine. A session cancelled by its timeout goes back to waiting."""
+    state = store.claim(session_id)
+    try:
+        history, conversation = _restore_session(state, answer)
+        return await _run_session_async(runtime, store, session_id, history, conversation, state["log_handle"])
+    except BaseException:
+        store.release(session_id)
+        raise
+
+# 🖥️ Interactive use: answer ask_user from the terminal
+def react_agent(log_text: str):
+    result = start_session(log_text)
+    while result["status"] == WAITING:
+        print(f"\n🤖 Agent asks: {result['question']}")
+        result = resume(result["session_id"], input("🧑 Your answer: "))
+    return result["history"]
 
-    return history
 log_example = """
 [2025-08-05 13:21:00] Error: Groovy script failed to compile.
   at org.codehaus.groovy.control.ErrorCollector.failIfErrors(ErrorCollector.java:309)
   at WorkflowScript.run(WorkflowScript:10)
 """
 
-react_agent(log_example)
+if __name__ == "__main__":
+    react_agent(log_example)
 
 
 
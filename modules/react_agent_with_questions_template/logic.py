@@ -3,18 +3,25 @@ import openai
 import re
 from dotenv import load_dotenv
 
+from modules.llm_client.actions import ActionError, ActionRegistry
+from modules.llm_client.cache import cached_chat_completion
+from modules.llm_client.history import ReActHistory
+from modules.llm_client.sessions import FAILED, FINISHED, WAITING, SessionStore
+from modules.token_counter.usage import usage_tracker
+
 # 🔒 Load your OpenAI key
 load_dotenv()
 openai.api_key = os.getenv("OPEN_AI_API_KEY")
 MODEL = "gpt-4o"
 
-# 🧠 Send prompt to OpenAI
-def call_openai(prompt: str) -> str:
-    response = openai.chat.completions.create(
+# 🧠 Send conversation to OpenAI
+def call_openai(messages: list) -> str:
+    response = cached_chat_completion(
         model=MODEL,
-        messages=[{"role": "user", "content": prompt}],
+        messages=messages,
         temperature=0
     )
+    usage_tracker.record("react_step", MODEL, response, messages=messages)
     return response.choices[0].message.content
 
 # 🔍 Parse ReAct block
@@ -34,91 +41,81 @@ def extract_react_block(text: str) -> dict:
         "observation": observation.group(1).strip() if observation else "",
     }
 
-# 🧱 Build full prompt from history (includes ask_user blocks)
-def build_full_prompt(history: list, input_text: str) -> str:
-    intro = (
-        "You are an AI agent using ReAct logic.\n"
-        "Your role is:\n"
-        "👉 TODO: describe your agent’s job clearly.\n"
-        "You can use actions like:\n"
-        "👉 TODO: list the allowed actions here (e.g. search_docs, ask_user, summarize_section, suggest_fix).\n"
-        "Use this format only:\n"
-        "<start>\nThought: ...\nAction: ...\nObservation: ...\n<end>\n"
-        "If you use ask_user(\"...\"), stop and wait.\n"
-    )
-
-    input_block = f"<input>\n{input_text}\n</input>\n\n"
-
-    history_block = "\n".join([
-        f"<start>\nThought: {h['thought']}\nAction: {h['action']}\nObservation: {h['observation']}\n<end>"
-        for h in history
-    ])
-
-    return intro + history_block + "\n" + input_block
-
-# 🧱 Partial prompt that skips "ask_user" waiting blocks
-def build_prompt_until_question(history: list, input_text: str) -> str:
-    intro = (
-        "You are an AI agent using ReAct logic.\n"
-        "Your role is:\n"
-        "👉 TODO: describe your agent’s job clearly.\n"
-        "You can use actions like:\n"
-        "👉 TODO: list allowed actions.\n"
-        "Use this format only:\n"
-        "<start>\nThought: ...\nAction: ...\nObservation: ...\n<end>\n"
-        "If you use ask_user(\"...\"), stop and wait.\n"
-    )
-
-    input_block = f"<input>\n{input_text}\n</input>\n\n"
-    block_list = []
-
-    for h in history:
-        if h['action'].startswith("ask_user") and h['observation'] == "Waiting for user input.":
-            break
-        block_list.append(
-            f"<start>\nThought: {h['thought']}\nAction: {h['action']}\nObservation: {h['observation']}\n<end>"
-        )
-
-    history_block = "\n".join(block_list)
-    return intro + history_block + "\n" + input_block
-
-# 🧪 Simulate agent actions
-def simulate_action(action: str, input_text: str) -> str:
-    # TODO: Add your custom action logic here
-    if action == "read_input()":
-        return input_text
-    elif action.startswith("search_docs("):
-        term = re.search(r'search_docs\("(.*?)"\)', action)
-        keyword = term.group(1) if term else "unknown"
-        return f"📚 Simulated result: Found related documentation for '{keyword}'."
-    elif action == "suggest_fix()":
-        return "✅ Fix suggested successfully."
-    else:
-        return "🤔 Unknown action."
-
-# 🎯 Agent loop
-def react_agent(input_text: str):
-    history = []
+# 🧪 Agent actions: register yours here, they are listed in the prompt automatically
+actions = ActionRegistry()
+actions.control("ask_user", "question")  # pauses the session
+actions.control("suggest_fix")           # ends the session (TODO: customize the stop action)
+
+@actions.action("read_input")
+def read_input(context):
+    return context["input"]
+
+# TODO: Add your custom actions here
+@actions.action("search_docs", "keyword", timeout_s=10)
+def search_docs(context, keyword):
+    return f"📚 Simulated result: Found related documentation for '{keyword}'."
+
+@actions.action("read_output", "handle")
+def read_output(context, handle):
+    try:
+        return context["store"].get(handle)
+    except KeyError as e:
+        return e.args[0]
+
+# 🧾 Static prefix (instructions + input): identical for every step, so it is prompt-cacheable
+SYSTEM_PROMPT = (
+    "You are an AI agent using ReAct logic.\n"
+    "Your role is:\n"
+    "👉 TODO: describe your agent’s job clearly.\n"
+    f"You can use these actions: {actions.signatures()}\n"
+    "Use this format only:\n"
+    "<start>\nThought: ...\nAction: ...\n<end>\n"
+    "The observation (or the user's answer) comes back in the next message.\n"
+    "Long outputs are shown as [output <id>: ...]; read_output(\"<id>\") shows one in full again.\n"
+    "If you use ask_user(\"...\"), stop and wait.\n"
+)
+
+def start_messages(input_text: str) -> list:
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": f"<input>\n{input_text}\n</input>"},
+    ]
+
+# 🧱 Render a completed step once (append-only history): the model's block, then the result as a user message
+def render_block(step: dict) -> list:
+    # Only a real answer to a parsed ask_user(); a malformed ask_user line gets its validation error as an observation
+    label = "User answer" if step.get("user_answer") else "Observation"
+    return [
+        {"role": "assistant", "content": f"<start>\nThought: {step['thought']}\nAction: {step['action']}\n<end>"},
+        {"role": "user", "content": f"{label}: {step['observation']}"},
+    ]
+
+# 🔧 Observation for one Action line (errors explain how to fix a malformed one)
+def simulate_action(action: str, input_text: str, store=None) -> str:
+    return actions.execute(action, {"input": input_text, "store": store})
+
+# 💾 Paused sessions are saved here
+session_store = SessionStore()
+
+def _save_session(store: SessionStore, session_id: str, status: str, history: list, conversation: ReActHistory,
+                  input_handle: str, question: str = None) -> dict:
+    store.save({
+        "session_id": session_id,
+        "status": status,
+        "question": question,
+        "input_handle": input_handle,
+        "history": history,
+        "conversation": conversation.to_dict(),
+    })
+    return {"session_id": session_id, "status": status, "question": question, "history": history}
+
+# 🎯 Agent loop (runs until ask_user or a stop condition, then saves the session)
+def _run_session(store: SessionStore, session_id: str, history: list, conversation: ReActHistory, input_handle: str) -> dict:
+    input_text = conversation.store.get(input_handle)
 
     while True:
-        # ⏸️ If waiting for user response
-        if history and history[-1]["action"].startswith("ask_user") and history[-1]["observation"] == "Waiting for user input.":
-            question = re.search(r'ask_user\("(.*?)"\)', history[-1]["action"])
-            question_text = question.group(1) if question else "Please answer:"
-            print(f"\n🤖 Agent asks: {question_text}")
-            user_input = input("🧑 Your answer: ")
-            history[-1]["observation"] = user_input
-            continue
-
-        # 🤔 Choose prompt building strategy
-        waiting_for_input = any(
-            h["action"].startswith("ask_user") and h["observation"] == "Waiting for user input."
-            for h in history
-        )
-        prompt = build_prompt_until_question(history, input_text) if waiting_for_input else build_full_prompt(history, input_text)
-
         # 🚀 Call LLM
-        response = call_openai(prompt)
+        response = call_openai(conversation.messages)
         print("🔁 Agent response:\n", response)
 
         # 🧠 Extract reasoning
@@ -126,28 +123,67 @@ def react_agent(input_text: str):
             block = extract_react_block(response)
         except Exception as e:
             print("❌ Parsing error:", e)
-            break
+            return _save_session(store, session_id, FAILED, history, conversation, input_handle)
 
         print(f"\n🧠 Thought: {block['thought']}\n⚙️ Action: {block['action']}")
 
-        # ⛔ Stop if asked user something
-        if block["action"].startswith("ask_user"):
-            block["observation"] = "Waiting for user input."
+        # 🧩 Check the action against the registry; the model sees what was wrong and retries
+        try:
+            name, args = actions.parse(block["action"])
+        except ActionError as e:
+            print(e)
+            block["observation"] = str(e)
             history.append(block)
+            conversation.add(block)
             continue
 
+        # ⛔ Stop if asked user something (resume() continues with the answer)
+        if name == "ask_user":
+            block["observation"] = "Waiting for user input."
+            history.append(block)
+            return _save_session(store, session_id, WAITING, history, conversation, input_handle, args[0])
+
         # ✅ TODO: Customize stop condition
-        if block["action"] == "suggest_fix()":
+        if name == "suggest_fix":
             block["observation"] = "✅ Final suggestion complete."
             history.append(block)
+            conversation.add(block)
             print("🎉 Agent finished.")
-            break
+            return _save_session(store, session_id, FINISHED, history, conversation, input_handle)
 
-        # 🔧 Simulate action
-        block["observation"] = simulate_action(block["action"], input_text)
+        # 🔧 Run action (under its timeout)
+        block["observation"] = actions.run(name, args, {"input": input_text, "store": conversation.store})
         history.append(block)
-
-    return history
+        conversation.add(block, inline=name == "read_output")
+
+# ▶️ Start a session: returns {"session_id", "status", "question", "history"}
+def start_session(input_text: str, store: SessionStore = session_store) -> dict:
+    conversation = ReActHistory(start_messages(input_text), render_block, MODEL, seen={"input": input_text})
+    input_handle = conversation.store.put(input_text)
+    return _run_session(store, store.new_id(), [], conversation, input_handle)
+
+# ⏯️ Continue a waiting session with the user's answer
+def resume(session_id: str, answer: str, store: SessionStore = session_store) -> dict:
+    state = store.claim(session_id)
+    try:
+        input_text = state["conversation"]["outputs"][state["input_handle"]]
+        conversation = ReActHistory.from_dict(state["conversation"], start_messages(input_text), render_block, MODEL)
+        history = state["history"]
+        history[-1]["observation"] = answer
+        history[-1]["user_answer"] = True
+        conversation.add(history[-1])
+        return _run_session(store, session_id, history, conversation, state["input_handle"])
+    except BaseException:
+        store.release(session_id)
+        raise
+
+# ⏸️ Terminal mode: ask the user directly
+def react_agent(input_text: str):
+    result = start_session(input_text)
+    while result["status"] == WAITING:
+        print(f"\n🤖 Agent asks: {result['question']}")
+        result = resume(result["session_id"], input("🧑 Your answer: "))
+    return result["history"]
 
 # ▶️ TODO: Replace with your actual input
 example_input = """
@@ -155,5 +191,5 @@ Please analyze this input and respond accordingly.
 You can simulate any content here.
 """
 
-react_agent(example_input)
-
+if __name__ == "__main__":
+    react_agent(example_input)
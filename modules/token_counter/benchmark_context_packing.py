@@ -0,0 +1,36 @@
+"""
+Benchmark: token reduction from context packing on the pipelines' example error lists.
+
+Reads `example_error_list` from the v1 and v2 run_*_pipeline.py files (without
+importing them) and reports the average tokens per error context before and
+after pack_context, for a few budgets.
+
+Run from the repository root:
+    python -m modules.token_counter.benchmark_context_packing --budgets 64 32 16
+"""
+
+import argparse
+
+from modules.token_counter.context_packing import pack_context
+from modules.token_counter.example_data import PIPELINE_FILES, load_example_errors
+from modules.token_counter.logic import count_tokens_many
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[64, 32, 16])
+    parser.add_argument("--model", default="gpt-4o")
+    args = parser.parse_args()
+
+    for path in PIPELINE_FILES:
+        contexts = [error["context"] for error in load_example_errors(path)]
+        original = sum(count_tokens_many(contexts, model=args.model)) / len(contexts)
+        print(f"📊 {path.parent.name}/{path.name}: {len(contexts)} errors, {original:.1f} tokens/context")
+
+        for budget in args.budgets:
+            packed = [pack_context(context, budget, model=args.model) for context in contexts]
+            average = sum(count_tokens_many(packed, model=args.model)) / len(packed)
+            print(f"• budget {budget:>4}: {average:6.1f} tokens/context ({1 - average / original:.0%} fewer)")
+
+
+if __name__ == "__main__":
+    main()
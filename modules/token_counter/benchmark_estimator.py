@@ -0,0 +1,74 @@
+"""
+Benchmark: approximate token estimator vs exact BPE counting on large log chunks.
+
+For chunks of the calibration corpus (synthetic CI logs + the repo's error contexts
+and prompts), reports:
+- estimator error vs the exact count
+- throughput (MB/s) of count_tokens, estimate_tokens and fits_budget
+- for fits_budget, how many budget checks still needed an exact encode, and whether
+  every decision matched the exact one
+
+The budgets are set relative to each chunk's exact size (e.g. 0.5 = half of its tokens).
+
+Run from the repository root:
+    python -m modules.token_counter.benchmark_estimator --sizes 262144 1048576 4194304
+"""
+
+import argparse
+import time
+
+from modules.token_counter.estimator import _calibration_for, estimate_tokens, fits_budget
+from modules.token_counter.example_data import load_corpus
+from modules.token_counter.logic import count_tokens, resolve_encoding_name
+
+
+def timed(run) -> tuple:
+    start = time.perf_counter()
+    result = run()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[262_144, 1_048_576, 4_194_304], help="Chunk sizes (chars)")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0.25, 0.5, 0.9, 0.99, 1.01, 1.1, 2.0],
+                        help="Budgets as a fraction of each chunk's exact token count")
+    parser.add_argument("--model", default="gpt-3.5-turbo")
+    parser.add_argument("--logs", nargs="*", default=[], help="Extra log files to add to the corpus")
+    args = parser.parse_args()
+
+    corpus = "\n".join(load_corpus(args.logs, synthetic_logs=200, seed=1000))  # not the calibration seed
+    _, max_rel_error = _calibration_for(args.model)
+    count_tokens("warm up", model=args.model)
+    if max_rel_error is None:
+        raise SystemExit(f"❌ {resolve_encoding_name(args.model)} is not calibrated (the estimator counts exactly); "
+                         f"run calibrate_estimator --model {args.model} --write first")
+    print(f"📊 corpus {len(corpus) / 1e6:.1f} M chars, {resolve_encoding_name(args.model)}, "
+          f"error bound ±{max_rel_error:.0%}")
+
+    for size in args.sizes:
+        chunk = corpus[:size]
+        megabytes = len(chunk.encode("utf-8")) / 1e6
+        exact, exact_seconds = timed(lambda: count_tokens(chunk, model=args.model))
+        estimate, estimate_seconds = timed(lambda: estimate_tokens(chunk, model=args.model))
+
+        decisions_ok = True
+        exact_fallbacks = 0
+        fits_seconds = 0.0
+        for fraction in args.budgets:
+            budget = int(exact * fraction)
+            fits, seconds = timed(lambda: fits_budget(chunk, budget, model=args.model))
+            fits_seconds += seconds
+            decisions_ok &= fits == (exact <= budget)
+            exact_fallbacks += estimate / (1 + max_rel_error) <= budget < estimate / (1 - max_rel_error)
+
+        print(f"\n• chunk {size:>9} chars: exact {exact} tokens, estimate {estimate} ({estimate / exact - 1:+.2%})")
+        print(f"  count_tokens     {megabytes / exact_seconds:8.1f} MB/s")
+        print(f"  estimate_tokens  {megabytes / estimate_seconds:8.1f} MB/s ({exact_seconds / estimate_seconds:.0f}x)")
+        print(f"  fits_budget      {exact_seconds * len(args.budgets) / fits_seconds:8.1f}x vs exact, "
+              f"{exact_fallbacks}/{len(args.budgets)} needed an exact encode, "
+              f"decisions {'all correct' if decisions_ok else 'WRONG'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark: token counting throughput (calls/sec).
+
+Compares, on prompt-sized texts (instruction block + Jenkins log context):
+- uncached:  tiktoken.encoding_for_model() on every call (previous behaviour)
+- cached:    count_tokens() with the per-model encoding cache
+- batched:   count_tokens_many() with tiktoken's threaded batch encoder
+
+Run from the repository root:
+    python -m modules.token_counter.benchmark_token_counter --prompts 2000
+"""
+
+import argparse
+import os
+import random
+import time
+
+import tiktoken
+
+from modules.token_counter.logic import count_tokens, count_tokens_many
+
+INSTRUCTIONS = (
+    "You are an expert DevOps assistant specializing in analyzing CI/CD logs and generating "
+    "structured outputs for failure diagnosis and repair.\n"
+    "Think step-by-step, wrap your reasoning in <trace> and return JSON inside <start> and <end>.\n"
+) * 8
+
+LOG_LINES = [
+    "[{t}] Error: Connection refused on port 5432",
+    "  at org.codehaus.groovy.control.ErrorCollector.failIfErrors(ErrorCollector.java:309)",
+    "  at WorkflowScript.run(WorkflowScript:{n})",
+    "[{t}] Running integration tests...",
+    "[{t}] Error: Timeout waiting for response after {n} ms",
+    "Caused by: java.net.SocketTimeoutException: Read timed out",
+]
+
+
+def make_prompts(count: int, log_lines: int) -> list:
+    prompts = []
+    for i in range(count):
+        lines = [
+            random.choice(LOG_LINES).format(t=f"12:{i % 60:02d}:{j % 60:02d}", n=i + j)
+            for j in range(log_lines)
+        ]
+        prompts.append(INSTRUCTIONS + "<start_log>\n" + "\n".join(lines) + "\n<end_log>")
+    return prompts
+
+
+def count_tokens_uncached(text: str, model: str) -> int:
+    return len(tiktoken.encoding_for_model(model).encode(text))
+
+
+def measure(label: str, count: int, run) -> float:
+    start = time.perf_counter()
+    run()
+    rate = count / (time.perf_counter() - start)
+    print(f"• {label:<32} {rate:10.0f} calls/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prompts", type=int, default=2000)
+    parser.add_argument("--log-lines", type=int, default=30, help="Log lines per prompt")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    prompts = make_prompts(args.prompts, args.log_lines)
+    count_tokens(prompts[0], model=args.model)  # load the BPE file once, outside the timings
+    avg_tokens = sum(count_tokens_many(prompts, model=args.model)) / len(prompts)
+    print(f"📊 {len(prompts)} prompts, ~{avg_tokens:.0f} tokens each, model {args.model}")
+
+    uncached = measure("uncached encoding_for_model", len(prompts),
+                       lambda: [count_tokens_uncached(p, args.model) for p in prompts])
+    measure("cached count_tokens", len(prompts),
+            lambda: [count_tokens(p, model=args.model) for p in prompts])
+    batched = measure(f"count_tokens_many ({args.threads} threads)", len(prompts),
+                      lambda: count_tokens_many(prompts, model=args.model, num_threads=args.threads))
+    print(f"⚡ batched vs uncached: {batched / uncached:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Calibrates the approximate token estimator (estimator.py) for one encoding.
+
+Builds a log corpus, splits it into chunks of 4 KB to 256 KB, and encodes every
+chunk exactly. It then fits a weight per feature (byte classes and runs) by
+least squares on half of the chunks, and reports the relative error on the other
+half. The error bound stored is the worst held-out error plus a safety margin.
+
+Corpus: synthetic Jenkins/CI logs (stack traces, timestamps, paths, hashes), the
+pipelines' example error contexts and the prompt templates, plus any --logs files.
+
+Run from the repository root:
+    python -m modules.token_counter.calibrate_estimator --model gpt-3.5-turbo
+    python -m modules.token_counter.calibrate_estimator --model gpt-4o --logs build.log --write
+"""
+
+import argparse
+import json
+import math
+import random
+
+import numpy as np
+
+from modules.token_counter.estimator import CALIBRATION_FILE, FEATURES, byte_class_counts
+from modules.token_counter.example_data import load_corpus
+from modules.token_counter.logic import count_tokens_many, resolve_encoding_name
+
+
+def make_chunks(documents: list, min_chars: int = 4096, max_chars: int = 262_144, seed: int = 0) -> list:
+    """Splits the corpus into chunks of random sizes (small documents are merged)."""
+    rng = random.Random(seed)
+    text = "\n".join(documents)
+    chunks = []
+    start = 0
+    while len(text) - start >= min_chars:
+        size = int(math.exp(rng.uniform(math.log(min_chars), math.log(max_chars))))
+        chunks.append(text[start:start + size])
+        start += size
+    return chunks
+
+
+def fit_weights(features: np.ndarray, exact: np.ndarray) -> np.ndarray:
+    """
+    Least squares on relative error (rows scaled by 1 / exact tokens), keeping weights
+    non-negative: features that get a negative weight are dropped and the fit is redone.
+    """
+    scaled = features / exact[:, None]
+    active = list(range(features.shape[1]))
+    while True:
+        solution, *_ = np.linalg.lstsq(scaled[:, active], np.ones(len(exact)), rcond=None)
+        if solution.min() >= 0:
+            break
+        active.pop(int(solution.argmin()))
+    weights = np.zeros(features.shape[1])
+    weights[active] = solution
+    return weights
+
+
+def relative_errors(weights: np.ndarray, features: np.ndarray, exact: np.ndarray) -> np.ndarray:
+    return np.abs(features @ weights - exact) / exact
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default="gpt-3.5-turbo", help="Model or encoding name")
+    parser.add_argument("--logs", nargs="*", default=[], help="Extra log files to add to the corpus")
+    parser.add_argument("--synthetic-logs", type=int, default=40)
+    parser.add_argument("--safety-margin", type=float, default=0.02, help="Added to the worst held-out error")
+    parser.add_argument("--write", action="store_true", help=f"Store the result in {CALIBRATION_FILE.name}")
+    args = parser.parse_args()
+
+    encoding_name = resolve_encoding_name(args.model)
+    chunks = make_chunks(load_corpus(args.logs, args.synthetic_logs))
+    random.Random(1).shuffle(chunks)
+    exact = np.array(count_tokens_many(chunks, model=args.model), dtype=np.float64)
+    features = np.array([[byte_class_counts(chunk)[name] for name in FEATURES] for chunk in chunks], dtype=np.float64)
+    print(f"📊 {len(chunks)} chunks, {sum(map(len, chunks)) / 1e6:.1f} M chars, {exact.sum() / 1e6:.2f} M tokens ({encoding_name})")
+
+    half = len(chunks) // 2
+    weights = fit_weights(features[:half], exact[:half])
+    train_error = relative_errors(weights, features[:half], exact[:half])
+    holdout_error = relative_errors(weights, features[half:], exact[half:])
+    print(f"• train   error: mean {train_error.mean():.2%}, max {train_error.max():.2%}")
+    print(f"• holdout error: mean {holdout_error.mean():.2%}, p99 {np.percentile(holdout_error, 99):.2%}, "
+          f"max {holdout_error.max():.2%}")
+
+    max_rel_error = math.ceil((holdout_error.max() + args.safety_margin) * 100) / 100
+    entry = {
+        "weights": {name: round(float(w), 4) for name, w in zip(FEATURES, weights)},
+        "max_rel_error": max_rel_error,
+    }
+    print(f"⚖️ {encoding_name}: {json.dumps(entry)}")
+
+    if args.write:
+        calibration = json.loads(CALIBRATION_FILE.read_text(encoding="utf-8")) if CALIBRATION_FILE.exists() else {}
+        calibration[encoding_name] = entry
+        CALIBRATION_FILE.write_text(json.dumps(calibration, indent=2), encoding="utf-8")
+        print(f"📁 Saved to {CALIBRATION_FILE}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import textwrap
+
+from modules.token_counter.estimator import fits_budget
+from modules.token_counter.logic import count_tokens, count_tokens_many
+
+# Same keywords the Jenkins log parser uses to detect error lines
+ERROR_KEYWORDS = ["exception", "error", "failed", "refused", "fatal", "trace"]
+
+ELISION_MARKER = "... [{count} lines elided] ..."
+
+# Priorities (lower is kept first)
+ERROR_LINE = 0     # error lines and "Caused by" lines
+EDGE_FRAME = 1     # first and last stack frames
+CONTEXT_LINE = 2   # everything else (incl. middle frames), nearest to a key line first
+
+
+def _is_frame(line: str) -> bool:
+    stripped = line.lstrip()
+    return stripped.startswith("at ") or stripped.startswith('File "')
+
+
+def _is_key(line: str) -> bool:
+    lowered = line.lower()
+    return lowered.lstrip().startswith("caused by") or any(keyword in lowered for keyword in ERROR_KEYWORDS)
+
+
+def _render(lines: list, kept: set) -> str:
+    output = []
+    elided = 0
+    for i, line in enumerate(lines):
+        if i in kept:
+            if elided:
+                output.append(ELISION_MARKER.format(count=elided))
+                elided = 0
+            output.append(line)
+        else:
+            elided += 1
+    if elided:
+        output.append(ELISION_MARKER.format(count=elided))
+    return "\n".join(output)
+
+
+def pack_context(context: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    """
+    Fits a log context into `max_tokens`, keeping the most useful lines.
+
+    The context is dedented and stripped first (that alone often saves tokens).
+    If it is still too long, lines are kept in this order until the budget is used:
+    error and "Caused by" lines, the first and last stack frames, then the other
+    lines closest to those. Dropped runs of lines become a single elision marker.
+    The top line is always kept, even if it alone exceeds the budget.
+    Every line is tokenized once.
+    """
+    lines = [line.rstrip() for line in textwrap.dedent(context).strip("\n").splitlines()]
+    packed = "\n".join(lines)
+    if not lines or fits_budget(packed, max_tokens, model=model):
+        return packed
+
+    # One pass: classify lines ("at ...Error..." frames count as frames, not error lines)
+    frames = [i for i, line in enumerate(lines) if _is_frame(line)]
+    priority = [
+        CONTEXT_LINE if _is_frame(line) else ERROR_LINE if _is_key(line) else CONTEXT_LINE
+        for line in lines
+    ]
+    for i in frames[:1] + frames[-1:]:
+        priority[i] = EDGE_FRAME
+    key_lines = {i for i, p in enumerate(priority) if p != CONTEXT_LINE}
+
+    # Distance of every line to the nearest key line (two linear sweeps)
+    distance = [len(lines)] * len(lines)
+    last = None
+    for i in range(len(lines)):
+        last = i if i in key_lines else last
+        if last is not None:
+            distance[i] = i - last
+    last = None
+    for i in reversed(range(len(lines))):
+        last = i if i in key_lines else last
+        if last is not None:
+            distance[i] = min(distance[i], last - i)
+
+    order = sorted(
+        range(len(lines)),
+        key=lambda i: (priority[i], distance[i], i)
+    )
+
+    # +1 per line for the newline; every run of dropped lines costs one marker
+    line_tokens = [count + 1 for count in count_tokens_many(lines, model=model)]
+    marker_tokens = count_tokens(ELISION_MARKER.format(count=len(lines)), model=model) + 1
+
+    kept = set()
+    used = 0
+    gaps = 1  # nothing kept yet: one run of dropped lines
+    for i in order:
+        # Keeping line i splits its dropped run in two, shortens it, or removes it
+        dropped_left = i > 0 and i - 1 not in kept
+        dropped_right = i < len(lines) - 1 and i + 1 not in kept
+        new_gaps = gaps + dropped_left + dropped_right - 1
+        # Strict priority order: stop at the first line that doesn't fit,
+        # but always keep the most important line (usually the error line)
+        if kept and used + line_tokens[i] + new_gaps * marker_tokens > max_tokens:
+            break
+        kept.add(i)
+        used += line_tokens[i]
+        gaps = new_gaps
+
+    return _render(lines, kept)
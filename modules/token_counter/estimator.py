@@ -0,0 +1,111 @@
+import json
+import string
+from pathlib import Path
+
+import numpy as np
+
+from modules.token_counter.logic import count_tokens, resolve_encoding_name
+
+# Byte classes of the UTF-8 text, each mapped to one symbol
+_CLASS_BYTES = {
+    b"a": string.ascii_letters.encode(),
+    b"0": string.digits.encode(),
+    b" ": b" \t",
+    b"\n": b"\r\n",
+    b".": string.punctuation.encode(),
+    b"~": bytes(range(128, 256)),
+}
+_SYMBOLS = bytearray(b"~" * 256)
+for _symbol, _members in _CLASS_BYTES.items():
+    for _byte in _members:
+        _SYMBOLS[_byte] = _symbol[0]
+_SYMBOLS = bytes(_SYMBOLS)
+
+# Features: bytes per class, plus runs of letters/digits/punctuation (BPE merges within a run,
+# so words and numbers cost roughly a token per run plus a little per byte)
+FEATURES = ["letter", "digit", "space", "newline", "punct", "non_ascii", "letter_runs", "digit_runs", "punct_runs"]
+_CLASS_FEATURES = dict(zip((symbol[0] for symbol in _CLASS_BYTES), FEATURES))
+_RUN_FEATURES = {ord("a"): "letter_runs", ord("0"): "digit_runs", ord("."): "punct_runs"}
+
+# Texts shorter than this are always counted exactly (encoding them is cheap anyway)
+EXACT_BELOW_CHARS = 4096
+
+# Optional, written by calibrate_estimator.py --write (e.g. to add o200k_base); merged over DEFAULT_CALIBRATION
+CALIBRATION_FILE = Path(__file__).resolve().parent / "estimator_calibration.json"
+
+# Tokens per feature count, and the error bound from calibrate_estimator.py (worst held-out
+# relative error + 2%) on the calibration corpus (CI logs, error contexts, prompt templates)
+DEFAULT_CALIBRATION = {
+    "cl100k_base": {
+        "weights": {"letter": 0.0596, "digit": 0.2919, "space": 0.1587, "newline": 0.0, "punct": 0.0,
+                    "non_ascii": 0.2784, "letter_runs": 0.7274, "digit_runs": 0.9931, "punct_runs": 0.6924},
+        "max_rel_error": 0.05,
+    },
+}
+
+
+def load_calibration(path: Path = CALIBRATION_FILE) -> dict:
+    calibration = {name: dict(values) for name, values in DEFAULT_CALIBRATION.items()}
+    if Path(path).exists():
+        calibration.update(json.loads(Path(path).read_text(encoding="utf-8")))
+    return calibration
+
+
+CALIBRATION = load_calibration()
+
+
+def byte_class_counts(text: str) -> dict:
+    """
+    Feature counts of `text` (see FEATURES), from a few vectorized passes over its
+    UTF-8 bytes. Much faster than BPE encoding.
+    """
+    symbols = np.frombuffer(text.encode("utf-8").translate(_SYMBOLS), dtype=np.uint8)
+    class_counts = np.bincount(symbols, minlength=256)
+    # A run starts at the first byte and wherever the class changes
+    run_starts = np.bincount(symbols[1:][symbols[1:] != symbols[:-1]], minlength=256)
+    if len(symbols):
+        run_starts[symbols[0]] += 1
+
+    counts = {name: int(class_counts[symbol]) for symbol, name in _CLASS_FEATURES.items()}
+    counts.update({name: int(run_starts[symbol]) for symbol, name in _RUN_FEATURES.items()})
+    return counts
+
+
+def _calibration_for(model: str) -> tuple:
+    """(weights, max_rel_error) of the model's encoding; (None, None) when it has not been calibrated."""
+    entry = CALIBRATION.get(resolve_encoding_name(model))
+    if entry is None:
+        return None, None
+    return entry["weights"], entry["max_rel_error"]
+
+
+def estimate_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
+    """
+    Approximate token count from byte-class and run counts (no BPE encoding).
+    Within `max_rel_error` of the exact count on the calibration corpus; the exact
+    count for encodings without a calibration (there is no measured bound to rely on).
+    """
+    weights, _ = _calibration_for(model)
+    if weights is None:
+        return count_tokens(text, model=model)
+    counts = byte_class_counts(text)
+    return round(sum(weights[name] * counts[name] for name in FEATURES))
+
+
+def fits_budget(text: str, max_tokens: int, model: str = "gpt-3.5-turbo") -> bool:
+    """
+    Whether `text` fits in `max_tokens`, encoding it exactly only when needed:
+    short texts, texts whose estimate is within the error bound of the limit, and
+    every text of an encoding that has not been calibrated.
+    """
+    _, max_rel_error = _calibration_for(model)
+    if len(text) < EXACT_BELOW_CHARS or max_rel_error is None:
+        return count_tokens(text, model=model) <= max_tokens
+
+    # |estimate - exact| <= max_rel_error * exact, so exact lies in [estimate / (1 + e), estimate / (1 - e)]
+    estimate = estimate_tokens(text, model=model)
+    if estimate / (1 - max_rel_error) <= max_tokens:
+        return True
+    if estimate / (1 + max_rel_error) > max_tokens:
+        return False
+    return count_tokens(text, model=model) <= max_tokens
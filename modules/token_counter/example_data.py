@@ -0,0 +1,80 @@
+"""
+Example data for the calibration script and the benchmarks (no runtime code depends on it):
+- the pipelines' `example_error_list`, read from the v1 and v2 run_*_pipeline.py files
+  without importing them
+- a log corpus: synthetic Jenkins/CI logs (stack traces, timestamps, paths, hashes),
+  those error contexts, the prompt templates, plus any extra log files
+"""
+
+import ast
+import random
+from pathlib import Path
+
+PIPELINES_DIR = Path(__file__).resolve().parents[1] / "ReAct_Agent_with_Planning_and_Tools"
+PIPELINE_FILES = [
+    PIPELINES_DIR / "version1" / "run_agent_pipeline.py",
+    PIPELINES_DIR / "version2" / "run_tool_calling_react_agent_pipeline.py",
+]
+
+
+def load_example_errors(path: Path) -> list:
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    for node in tree.body:
+        if isinstance(node, ast.Assign) and any(getattr(t, "id", None) == "example_error_list" for t in node.targets):
+            return ast.literal_eval(node.value)
+    return []
+
+
+PROMPTS_DIR = Path(__file__).resolve().parents[2] / "prompts"
+
+LOG_LINES = [
+    "[{t}] Started by user admin",
+    "[{t}] Running on Jenkins in /var/lib/jenkins/workspace/{job}",
+    "[{t}] [Pipeline] stage ({stage})",
+    "[{t}] + mvn -B -DskipTests=false clean verify -pl {job}-service",
+    "[{t}] [INFO] Building {job}-service 1.{n}.0-SNAPSHOT",
+    "[{t}] [INFO] Tests run: {n}, Failures: {m}, Errors: 0, Skipped: 2, Time elapsed: {n}.{m} s",
+    "[{t}] [ERROR] Failed to execute goal org.apache.maven.plugins:maven-surefire-plugin:3.0.0:test",
+    "[{t}] Error: Connection refused on port {port}",
+    "[{t}] Error: Timeout waiting for response after {n} ms",
+    "java.lang.IllegalStateException: Failed to load ApplicationContext for [{job}]",
+    "\tat org.springframework.test.context.cache.DefaultCacheAwareContextLoaderDelegate.loadContext(DefaultCacheAwareContextLoaderDelegate.java:{n})",
+    "\tat org.codehaus.groovy.control.ErrorCollector.failIfErrors(ErrorCollector.java:309)",
+    "\tat WorkflowScript.run(WorkflowScript:{n})",
+    "Caused by: java.net.SocketTimeoutException: Read timed out",
+    "Traceback (most recent call last):",
+    '  File "/home/jenkins/agent/workspace/{job}/src/app/main.py", line {n}, in <module>',
+    "    raise RuntimeError(f\"unexpected status {{response.status_code}}\")",
+    "RuntimeError: unexpected status 503",
+    "[{t}] #12 [build 4/7] RUN pip install --no-cache-dir -r requirements.txt",
+    "[{t}] #12 sha256:{sha} 12.{m}MB / 48.{n}MB {m}.{n}s",
+    "[{t}] npm ERR! code ERESOLVE while resolving: {job}@{n}.{m}.0",
+    "[{t}] Downloading https://repo.maven.apache.org/maven2/org/{job}/{job}-core/{n}.{m}/{job}-core-{n}.{m}.jar",
+    "[{t}] WARNING: Résumé of step '{stage}' – durée {n}s ✓",
+    "[{t}] Finished: FAILURE",
+    "",
+]
+JOBS = ["payments", "checkout", "auth-gateway", "inventory", "notification", "search-indexer"]
+STAGES = ["Checkout", "Build", "Unit Tests", "Integration Tests", "Docker Build", "Deploy"]
+
+
+def make_log(lines: int, seed: int) -> str:
+    rng = random.Random(seed)
+    output = []
+    for i in range(lines):
+        output.append(rng.choice(LOG_LINES).format(
+            t=f"{rng.randrange(24):02d}:{rng.randrange(60):02d}:{rng.randrange(60):02d}",
+            job=rng.choice(JOBS), stage=rng.choice(STAGES), port=rng.choice([443, 5432, 6379, 8080]),
+            n=rng.randrange(1, 5000), m=rng.randrange(0, 100), sha=f"{rng.getrandbits(256):064x}",
+        ))
+    return "\n".join(output)
+
+
+def load_corpus(log_paths=(), synthetic_logs: int = 40, seed: int = 0) -> list:
+    """Corpus documents: synthetic CI logs, example error contexts, prompt templates and extra log files."""
+    documents = [make_log(random.Random(seed + i).randrange(200, 4000), seed + i) for i in range(synthetic_logs)]
+    for path in PIPELINE_FILES:
+        documents.append("\n".join(error["context"] for error in load_example_errors(path)))
+    documents.extend(path.read_text(encoding="utf-8") for path in sorted(PROMPTS_DIR.glob("*.md")))
+    documents.extend(Path(path).read_text(encoding="utf-8", errors="replace") for path in log_paths)
+    return documents
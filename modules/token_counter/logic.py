@@ -1,11 +1,138 @@
+import hashlib
+import os
+import tempfile
+import time
+from functools import lru_cache
+
 import tiktoken
+import tiktoken.registry
+from tiktoken.model import encoding_name_for_model
+
+# Set TOKEN_COUNTER_OFFLINE=1 to never download BPE files: missing assets fail immediately
+# instead of hanging on a network timeout. Pre-seed the cache with warm_up() / preload_assets.py.
+OFFLINE = os.getenv("TOKEN_COUNTER_OFFLINE", "0") == "1"
+
+# Models used across the project's pipelines
+DEFAULT_WARM_UP_MODELS = ("gpt-3.5-turbo", "gpt-4o", "text-embedding-3-small")
+
+
+class TokenizerAssetsMissing(RuntimeError):
+    """Raised in offline mode when the BPE files of an encoding are not in the local cache."""
+
+
+def cache_dir() -> str:
+    """The directory tiktoken reads cached BPE files from (same lookup order as tiktoken; "" = no cache)."""
+    if "TIKTOKEN_CACHE_DIR" in os.environ:
+        return os.environ["TIKTOKEN_CACHE_DIR"]
+    if "DATA_GYM_CACHE_DIR" in os.environ:
+        return os.environ["DATA_GYM_CACHE_DIR"]
+    return os.path.join(tempfile.gettempdir(), "data-gym-cache")
+
+
+def resolve_encoding_name(model: str) -> str:
+    """Model name (e.g. "gpt-4o") or encoding name (e.g. "cl100k_base") → encoding name."""
+    try:
+        return encoding_name_for_model(model)
+    except KeyError:
+        return model
+
+
+@lru_cache(maxsize=None)
+def encoding_assets(encoding_name: str) -> tuple:
+    """
+    Remote files tiktoken loads for an encoding, read from the encoding's constructor in
+    tiktoken's registry (built-in and plugin encodings alike), following constructors that
+    build on another one (e.g. o200k_harmony on o200k_base). None for an unknown encoding.
+    """
+    if encoding_name not in tiktoken.registry.list_encoding_names():
+        return None
+    constructors = tiktoken.registry.ENCODING_CONSTRUCTORS
+    urls, seen = [], set()
+    pending = [constructors[encoding_name]]
+    while pending:
+        constructor = pending.pop()
+        if constructor in seen:
+            continue
+        seen.add(constructor)
+        code = constructor.__code__
+        urls += [value for value in code.co_consts if isinstance(value, str) and "://" in value and value not in urls]
+        pending += [constructor.__globals__[name] for name in code.co_names
+                    if constructor.__globals__.get(name) in constructors.values()]
+    return tuple(urls)
+
+
+def missing_assets(encoding_name: str) -> list:
+    """
+    URLs of the encoding's BPE files that are not in the local cache yet (tiktoken keeps
+    each under sha1(url) in cache_dir()). Raises TokenizerAssetsMissing for an encoding
+    tiktoken doesn't know, since nothing can be checked for it.
+    """
+    urls = encoding_assets(encoding_name)
+    if urls is None:
+        raise TokenizerAssetsMissing(
+            f"❌ Unknown encoding '{encoding_name}': tiktoken knows {', '.join(tiktoken.registry.list_encoding_names())}"
+        )
+    directory = cache_dir()
+    return [
+        url for url in urls
+        if not directory or not os.path.exists(os.path.join(directory, hashlib.sha1(url.encode()).hexdigest()))
+    ]
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-3.5-turbo"):
+    """
+    Returns the tiktoken encoding for a model name (e.g. "gpt-4o") or an
+    encoding name (e.g. "cl100k_base"). Resolved once per process and cached.
+    """
+    encoding_name = resolve_encoding_name(model)
+    if OFFLINE:
+        missing = missing_assets(encoding_name)
+        if missing:
+            raise TokenizerAssetsMissing(
+                f"❌ Tokenizer assets for '{encoding_name}' are not in {cache_dir()}: {', '.join(missing)}. "
+                f"Run `python -m modules.token_counter.preload_assets --cache-dir <dir>` with network access "
+                f"and set TIKTOKEN_CACHE_DIR to that directory."
+            )
+    return tiktoken.get_encoding(encoding_name)
+
+
+def warm_up(models=DEFAULT_WARM_UP_MODELS, cache_dir_path: str = None) -> dict:
+    """
+    Loads the encodings of `models` once, downloading missing BPE files into the
+    cache (run at image build time or service boot). Returns seconds per model.
+    """
+    if cache_dir_path:
+        os.makedirs(cache_dir_path, exist_ok=True)
+        os.environ["TIKTOKEN_CACHE_DIR"] = str(cache_dir_path)
+        get_encoding.cache_clear()
+
+    timings = {}
+    for model in models:
+        start = time.perf_counter()
+        get_encoding(model).encode("warm up")
+        timings[model] = time.perf_counter() - start
+    return timings
+
 
 def count_tokens(text: str, model: str = "gpt-3.5-turbo") -> int:
-    encoding = tiktoken.encoding_for_model(model)
+    encoding = get_encoding(model)
     tokens = encoding.encode(text)
     return len(tokens)
 
+def count_tokens_many(texts: list, model: str = "gpt-3.5-turbo", num_threads: int = None) -> list:
+    """
+    Counts tokens for many texts at once using tiktoken's threaded batch encoder
+    (tiktoken releases the GIL, so threads run in parallel). Defaults to one thread
+    per CPU core. Returns one count per text, in order.
+    """
+    encoding = get_encoding(model)
+    num_threads = num_threads or os.cpu_count() or 1
+    if num_threads == 1:
+        # The thread pool only adds overhead on a single core
+        return [len(encoding.encode(text)) for text in texts]
+    return [len(tokens) for tokens in encoding.encode_batch(list(texts), num_threads=num_threads)]
+
 if __name__ == "__main__":
     sample = str(input("Insert your sentence to tokenize: "))
     print("Token count:", count_tokens(sample))
-
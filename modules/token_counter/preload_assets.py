@@ -0,0 +1,53 @@
+"""
+Pre-seeds a local tiktoken cache so token counting never needs the network.
+
+Run once with network access (e.g. in a Dockerfile), then point the runtime at
+the same directory and enable offline mode:
+
+    python -m modules.token_counter.preload_assets --cache-dir /opt/tiktoken_cache
+    export TIKTOKEN_CACHE_DIR=/opt/tiktoken_cache TOKEN_COUNTER_OFFLINE=1
+
+With --check, nothing is downloaded: the command exits non-zero if any asset is missing.
+"""
+
+import argparse
+import os
+import sys
+
+from modules.token_counter.logic import (
+    DEFAULT_WARM_UP_MODELS, TokenizerAssetsMissing, cache_dir, missing_assets, resolve_encoding_name, warm_up
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cache-dir", default=os.environ.get("TIKTOKEN_CACHE_DIR"),
+                        help="Cache directory (defaults to TIKTOKEN_CACHE_DIR / tiktoken's default)")
+    parser.add_argument("--models", nargs="+", default=list(DEFAULT_WARM_UP_MODELS),
+                        help="Model or encoding names to preload")
+    parser.add_argument("--check", action="store_true", help="Only verify that the assets are cached")
+    args = parser.parse_args()
+
+    if args.cache_dir:
+        os.environ["TIKTOKEN_CACHE_DIR"] = args.cache_dir
+
+    if args.check:
+        failed = False
+        for model in args.models:
+            try:
+                urls = missing_assets(resolve_encoding_name(model))
+            except TokenizerAssetsMissing as e:
+                print(e)
+                failed = True
+                continue
+            failed = failed or bool(urls)
+            print(f"{'❌' if urls else '✅'} {model}: {'missing ' + ', '.join(urls) if urls else 'cached'}")
+        sys.exit(1 if failed else 0)
+
+    for model, seconds in warm_up(args.models, args.cache_dir).items():
+        print(f"✅ {model} ({resolve_encoding_name(model)}) ready in {seconds * 1000:.0f} ms")
+    print(f"📁 Cache directory: {cache_dir()}")
+
+
+if __name__ == "__main__":
+    main()
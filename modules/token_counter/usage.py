@@ -0,0 +1,173 @@
+import json
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+
+from modules.token_counter.logic import count_tokens
+
+# USD per 1M tokens: (input, cached input, output)
+PRICING = {
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-3.5-turbo": (0.50, 0.50, 1.50),
+    "text-embedding-3-small": (0.02, 0.02, 0.0),
+}
+
+# Scenario the current calls belong to (e.g. one error of the pipeline). asyncio tasks and asyncio.to_thread inherit
+# it; work handed to a thread pool or a new thread must run in contextvars.copy_context() to keep it
+current_scenario = ContextVar("current_scenario", default="default")
+
+
+@contextmanager
+def scenario(name: str):
+    """Attributes every LLM call made inside the block to `name`."""
+    token = current_scenario.set(name)
+    try:
+        yield
+    finally:
+        current_scenario.reset(token)
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> float:
+    input_price, cached_price, output_price = PRICING.get(model, (0.0, 0.0, 0.0))
+    uncached = prompt_tokens - cached_tokens
+    return (uncached * input_price + cached_tokens * cached_price + completion_tokens * output_price) / 1_000_000
+
+
+def estimate_cache_savings(model: str, cached_tokens: int) -> float:
+    """What the cached prompt tokens would have cost more at the full input price."""
+    input_price, cached_price, _ = PRICING.get(model, (0.0, 0.0, 0.0))
+    return cached_tokens * (input_price - cached_price) / 1_000_000
+
+
+class UsageTracker:
+    """
+    Collects token usage of every LLM call in the process, with per-scenario,
+    per-stage and per-model breakdowns.
+
+    record() reads `response.usage` (prompt, completion and cached tokens). When a
+    response carries no usage (e.g. a stream cancelled before its usage chunk), tokens
+    are counted locally with count_tokens and the record is marked "estimated": cached
+    tokens are unknown there, so its cost is an upper bound.
+    Responses served from the local response cache (from_cache) cost nothing.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.lock = threading.Lock()
+
+    def record(self, stage: str, model: str, response=None, messages: list = None, completion: str = None) -> dict:
+        usage = getattr(response, "usage", None)
+        if getattr(response, "from_cache", False):
+            entry = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "source": "response_cache",
+                     "estimated": False}
+        elif usage is not None:
+            details = getattr(usage, "prompt_tokens_details", None)
+            entry = {
+                "prompt_tokens": usage.prompt_tokens or 0,
+                "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+                "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+                "source": "api",
+                "estimated": False,
+            }
+        else:
+            prompt_text = "\n".join(str(m.get("content") or "") for m in messages or [])
+            entry = {
+                "prompt_tokens": count_tokens(prompt_text, model=model),
+                "completion_tokens": count_tokens(completion or "", model=model),
+                "cached_tokens": 0,
+                "source": "local_count",
+                "estimated": True,
+            }
+
+        entry.update({
+            "scenario": current_scenario.get(),
+            "stage": stage,
+            "model": model,
+            "cost_usd": estimate_cost(model, entry["prompt_tokens"], entry["completion_tokens"], entry["cached_tokens"]),
+            "cache_savings_usd": estimate_cache_savings(model, entry["cached_tokens"]),
+        })
+        with self.lock:
+            self.records.append(entry)
+        return entry
+
+    def totals(self, records: list = None) -> dict:
+        records = self.records if records is None else records
+        prompt_tokens = sum(r["prompt_tokens"] for r in records)
+        cached_tokens = sum(r["cached_tokens"] for r in records)
+        return {
+            "calls": len(records),
+            "response_cache_hits": sum(r["source"] == "response_cache" for r in records),
+            "estimated_calls": sum(r.get("estimated", False) for r in records),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": sum(r["completion_tokens"] for r in records),
+            "cached_tokens": cached_tokens,
+            "cache_hit_rate": round(cached_tokens / prompt_tokens, 4) if prompt_tokens else 0.0,
+            "cost_usd": round(sum(r["cost_usd"] for r in records), 6),
+            "cache_savings_usd": round(sum(r["cache_savings_usd"] for r in records), 6),
+        }
+
+    def scenario_totals(self, name: str = None) -> dict:
+        """Totals for one scenario (the current one by default)."""
+        name = name or current_scenario.get()
+        with self.lock:
+            return self.totals([r for r in self.records if r["scenario"] == name])
+
+    def breakdown(self, key: str) -> dict:
+        groups = {}
+        for r in self.records:
+            groups.setdefault(r[key], []).append(r)
+        return {name: self.totals(group) for name, group in groups.items()}
+
+    def summary(self) -> dict:
+        with self.lock:
+            return {
+                "total": self.totals(),
+                "by_scenario": self.breakdown("scenario"),
+                "by_stage": self.breakdown("stage"),
+                "by_model": self.breakdown("model"),
+            }
+
+    def format_summary(self) -> str:
+        summary = self.summary()
+        lines = ["📊 TOKEN USAGE"]
+
+        def line(name, t):
+            return (f"  {name:<24} calls {t['calls']:>3} | prompt {t['prompt_tokens']:>8} "
+                    f"(cached {t['cached_tokens']:>7}) | completion {t['completion_tokens']:>7} | ${t['cost_usd']:.4f}")
+
+        total = summary["total"]
+        lines.append(line("TOTAL", total))
+        lines.append(f"🗄️ Prompt cache: {total['cache_hit_rate']:.0%} of prompt tokens cached, "
+                     f"saved ${total['cache_savings_usd']:.4f}")
+        if total["estimated_calls"]:
+            lines.append(f"⚠️ {total['estimated_calls']} of {total['calls']} calls had no API usage (cancelled streams): "
+                         f"their tokens are counted locally, cached tokens and cost are estimates")
+        if total["response_cache_hits"]:
+            lines.append(f"♻️ Response cache: {total['response_cache_hits']} of {total['calls']} calls answered locally")
+        for section in ("by_stage", "by_model", "by_scenario"):
+            lines.append(f" {section.replace('_', ' ')}:")
+            lines.extend(line(name, totals) for name, totals in summary[section].items())
+
+        scenarios = summary["by_scenario"]
+        if scenarios:
+            costliest = max(scenarios, key=lambda name: scenarios[name]["cost_usd"])
+            lines.append(f"💸 Most expensive scenario: {costliest} (${scenarios[costliest]['cost_usd']:.4f})")
+        return "\n".join(lines)
+
+    def save(self, directory: Path) -> Path:
+        """Writes the summary as JSON next to the trace files."""
+        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+        path = Path(directory) / f"usage_{timestamp}.json"
+        path.write_text(json.dumps(self.summary(), indent=2), encoding="utf-8")
+        return path
+
+    def reset(self):
+        with self.lock:
+            self.records = []
+
+
+# Shared, process-wide tracker used by all LLM call sites
+usage_tracker = UsageTracker()